@@ -7,35 +7,142 @@ import pandas as pd
 import csv
 
 
-def table_creater(input,query): 
-    conn=sqlite3.connect('query_flex')
+# Tables stay loaded in one in-memory SQLite database for the whole session.
+# Submit only re-reads the slots whose file, sheet or modification time changed.
+conn=sqlite3.connect(':memory:')
+loaded_slots={}  # slot number -> (alias, path, sheet, mtime)
+
+# The result view keeps the query's cursor open and inserts PAGE_ROWS rows at a
+# time as the user scrolls near the bottom; export re-runs the query instead.
+PAGE_ROWS=500
+EXPORT_CHUNK_ROWS=10000
+result_cursor=None
+result_query=None
+loading_rows=False
+
+
+def quote_name(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def read_source(path,sheet):
+    ext=os.path.splitext(path)[1].lower()
+    if ext=='.xlsx' and sheet!='':
+        return pd.read_excel(path,sheet_name=sheet)
+    if ext=='.xlsx':
+        return pd.read_excel(path)
+    if ext=='.csv':
+        return pd.read_csv(path)
+    return None
+
+
+def drop_slot(slot):
+    alias=loaded_slots.pop(slot)[0]
+    conn.execute(f'DROP TABLE IF EXISTS {quote_name(alias)}')
+
+
+def staged_name(slot):
+    return quote_name(f'__slot_{slot}')
+
+
+def ingest_tables(input):
+    # An open SELECT keeps SQLite from dropping or replacing its tables.
+    close_result()
+    wanted={}
+    for slot,(path,alias,sheet) in enumerate(input,1):
+        if path!='' and alias!='' and os.path.exists(path):
+            wanted[slot]=(alias,path,sheet,os.path.getmtime(path))
+    # SQLite table names ignore case, so no two slots may share an alias.
+    seen={}
+    for slot,state in wanted.items():
+        other=seen.setdefault(state[0].lower(),slot)
+        if other!=slot:
+            messagebox.showerror("Error",f"Tables {other} and {slot} both use the alias {state[0]}")
+            return
+    # Tables of cleared or changed slots are moved out of the way first, so
+    # aliases can move or swap between slots.
+    for slot in list(loaded_slots):
+        previous=loaded_slots[slot]
+        if slot not in wanted:
+            drop_slot(slot)
+        elif wanted[slot]!=previous:
+            try:
+                conn.execute(f'ALTER TABLE {quote_name(previous[0])} RENAME TO {staged_name(slot)}')
+            except sqlite3.Error:
+                loaded_slots.pop(slot)  # dropped by a query; it is read again below
+    for slot,state in wanted.items():
+        previous=loaded_slots.get(slot)
+        if previous==state:
+            continue
+        loaded=False
+        try:
+            if previous is not None and previous[1:]==state[1:]:
+                # Same file, new table name: rename instead of reading it again.
+                conn.execute(f'ALTER TABLE {staged_name(slot)} RENAME TO {quote_name(state[0])}')
+            else:
+                src=read_source(state[1],state[2])
+                if src is None:
+                    continue
+                # 'fail' keeps a table created by a query from being overwritten.
+                src.to_sql(state[0],conn,if_exists='fail',index=False)
+            loaded=True
+        except Exception as e:
+            messagebox.showerror("Error",f"Could not load {state[1]} as {state[0]}: {e}")
+        finally:
+            if previous is not None:
+                conn.execute(f'DROP TABLE IF EXISTS {staged_name(slot)}')
+            if loaded:
+                loaded_slots[slot]=state
+            else:
+                loaded_slots.pop(slot,None)
+
+
+def close_result():
+    global result_cursor
+    if result_cursor is not None:
+        result_cursor.close()
+        result_cursor=None
+
+
+# Returns the result's column names (empty for statements without rows), or
+# None when the query failed.
+def run_query(query):
+    global result_cursor, result_query
+    close_result()
     cur=conn.cursor()
-
-    for tbl_info in input:
-        if tbl_info[0]!='' and tbl_info[1]!='':
-            head,tail=os.path.split(tbl_info[0])
-            if tail.split('.')[1].lower()=='xlsx' and tbl_info[2]!='':
-                src=pd.read_excel(tbl_info[0],sheet_name=tbl_info[2])
-                src.to_sql(tbl_info[1],conn,if_exists='replace',index=False)
-            
-            if tail.split('.')[1].lower()=='xlsx' and tbl_info[2]=='':
-                src=pd.read_excel(tbl_info[0])
-                src.to_sql(tbl_info[1],conn,if_exists='replace',index=False)
-
-            if tail.split('.')[1].lower()=='csv':
-                src=pd.read_csv(tbl_info[0])
-                src.to_sql(tbl_info[1],conn,if_exists='replace',index=False)
-    
     try:
-        src_rest=cur.execute(query)
-        column_names = [description[0] for description in cur.description]
-        df_result = pd.DataFrame(cur.fetchall(),columns=column_names)
+        cur.execute(query)
     except Exception as e:
+        cur.close()
         messagebox.showerror("Error", e)
-    finally:        
-        conn.close()
-        os.remove('query_flex')
-    return df_result
+        return None
+    if cur.description is None:
+        conn.commit()
+        cur.close()
+        return []
+    result_cursor=cur
+    result_query=query
+    return [description[0] for description in cur.description]
+
+
+def load_more_rows(treeview):
+    global loading_rows
+    loading_rows=False
+    if result_cursor is None:
+        return
+    rows=result_cursor.fetchmany(PAGE_ROWS)
+    for row in rows:
+        treeview.insert('', 'end', values=['' if value is None else value for value in row])
+    if len(rows)<PAGE_ROWS:
+        close_result()
+
+
+def on_treeview_scroll(treeview, scrollbar, first, last):
+    global loading_rows
+    scrollbar.set(first, last)
+    if float(last)>0.9 and result_cursor is not None and not loading_rows:
+        loading_rows=True
+        treeview.after_idle(load_more_rows, treeview)
 
 def clear_entries():
     for widget in widgets_frame.winfo_children():
@@ -43,38 +150,33 @@ def clear_entries():
             widget.delete(0, 'end')
 
 
-def populate_treeview(treeview, df):
+def populate_treeview(treeview):
     treeview.delete(*treeview.get_children())
-    for index, row in df.iterrows():
-        treeview.insert('', 'end', values=row.tolist())
+    load_more_rows(treeview)
 
 def export_treeview():
+    if result_query is None:
+        return
     # Ask user for file location to save
     file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
     
     if file_path:
-        # Open the file in write mode
-        with open(file_path, 'w', newline='') as file:
-            writer = csv.writer(file)
-            
-            # Write column headers
-            writer.writerow(get_column_names(treeview))
-            
-            # Traverse through each item in the treeview and export its data
-            export_treeview_items(treeview, writer)
-
-def get_column_names(treeview):
-    # Get column names from Treeview
-    return [treeview.heading(column)["text"] for column in treeview["columns"]]
-
-def export_treeview_items(treeview, writer, parent=""):
-    # Traverse through each item in the treeview
-    for item in treeview.get_children(parent):
-        values = [treeview.set(item, column) for column in treeview["columns"]]
-        writer.writerow(values)
-        # Recursively export child items if present
-        export_treeview_items(treeview, writer, item)
-     
+        # The whole result is exported, not just the rows loaded into the view
+        cur=conn.cursor()
+        try:
+            cur.execute(result_query)
+            with open(file_path, 'w', newline='') as file:
+                writer = csv.writer(file)
+                writer.writerow([description[0] for description in cur.description])
+                while True:
+                    rows=cur.fetchmany(EXPORT_CHUNK_ROWS)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+        except Exception as e:
+            messagebox.showerror("Error", e)
+        finally:
+            cur.close()
 
 def show_menu(event):
     # Ensure an item is selected
@@ -117,6 +219,9 @@ def get_values():
         path_4_exist=os.path.exists(path_4)
         file_exist_validation(path_4,path_4_exist)
 
+    tbls = [[path_1, tbl1_alias,sheet_1], [path_2, tbl2_alias,sheet_2],[path_3, tbl3_alias,sheet_3],[path_4, tbl4_alias,sheet_4]]
+    ingest_tables(tbls)
+
 
    
 
@@ -124,8 +229,9 @@ def get_values():
 def get_query():
     global treeview, table_frame,resized_image_d
     input_query = text_editor.get("1.0", "end-1c")
-    tbls = [[path_1, tbl1_alias,sheet_1], [path_2, tbl2_alias,sheet_2],[path_3, tbl3_alias,sheet_3],[path_4, tbl4_alias,sheet_4]]
-    output = table_creater(tbls, input_query)
+    columns = run_query(input_query)
+    if columns is None:
+        return
     if 'treeview' in globals():
         treeview.destroy()  # Destroy the existing Treeview
     if 'table_frame' in globals():
@@ -136,7 +242,6 @@ def get_query():
     table_frame.pack(fill='both', expand=True)
 
     # Create Treeview widget
-    columns = list(output.columns)
     treeview = ttk.Treeview(table_frame, columns=columns, show='headings', style='Custom.Treeview')
     treeview.grid(row=0, column=0, sticky='nsew')  # Use grid instead of pack
     table_frame.grid_rowconfigure(0, weight=1)  # Ensure the row expands vertically
@@ -150,7 +255,7 @@ def get_query():
     # Create vertical scrollbar
     yscrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=treeview.yview, style='Custom.Vertical.TScrollbar')
     yscrollbar.grid(row=0, column=1, sticky='ns')  # Place scrollbar to the right of the Treeview
-    treeview.configure(yscrollcommand=yscrollbar.set)
+    treeview.configure(yscrollcommand=lambda first, last: on_treeview_scroll(treeview, yscrollbar, first, last))
 
     export_button = ttk.Button(table_frame, text="csv",image=resized_image_d, command=export_treeview)
     export_button.grid(row=0, column=2, sticky='ns')
@@ -159,7 +264,7 @@ def get_query():
 
     for col in columns:
         treeview.heading(col, text=col)
-    populate_treeview(treeview, output)
+    populate_treeview(treeview)
 
 # Instantiate the instance of the window
 root = tk.Tk() 
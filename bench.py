@@ -0,0 +1,419 @@
+# Benchmark harness: generates synthetic CSV/XLSX files and times the desktop
+# app's own entry points (add_file, run_query, display_results, exports and
+# plot_chart) on Qt's offscreen platform, recording peak RSS for each step.
+#
+#   python bench.py --sizes 10k,1M --shapes narrow,wide --out bench/v2.1.json --baseline bench/v2.0.json
+#
+# Every dataset runs in a fresh process with an empty HOME, so RSS and the
+# Excel/profile caches do not carry over between datasets.
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from engine import APP_DIR, EXCEL_MAX_ROWS
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = "10k,1M,10M"
+DEFAULT_SHAPES = "narrow,wide"
+DEFAULT_FORMATS = "csv,xlsx"
+DEFAULT_DATA_DIR = os.path.join(APP_DIR, "bench_data")
+# Writing or reading more cells than this through openpyxl/xlsxwriter takes
+# many minutes, so larger XLSX steps are recorded as skipped.
+DEFAULT_MAX_XLSX_CELLS = 10_000_000
+# A step regresses when it is slower (or peaks higher) than the baseline by
+# this ratio and by more than the absolute floor, which absorbs timer noise
+# on small datasets.
+DEFAULT_THRESHOLDS = {"time_ratio": 1.2, "min_seconds": 0.05, "rss_ratio": 1.2, "min_rss_mb": 20}
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_BENCH_FAILED = 3
+
+WIDE_NUMERIC_COLUMNS = 38
+WIDE_TEXT_COLUMNS = 7
+RSS_SAMPLE_S = 0.01
+POLL_S = 0.005
+
+
+def parse_rows(text: str) -> int:
+    text = text.strip().lower().replace("_", "")
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def rows_label(rows: int) -> str:
+    if rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+# --- Synthetic data ---
+# Both shapes share id/city/category/amount/qty/ts so the same queries and
+# charts run on either; wide adds numeric and text filler columns.
+def dataset_select(rows: int, shape: str) -> str:
+    columns = [
+        "i AS id",
+        "'city_' || (hash(i) % 50) AS city",
+        "'cat_' || (i % 7) AS category",
+        "round((hash(i * 31) % 100000) / 100.0, 2) AS amount",
+        "CAST(hash(i * 17) % 500 AS INTEGER) AS qty",
+        "TIMESTAMP '2020-01-01' + to_seconds(CAST(i * 37 % 94608000 AS BIGINT)) AS ts",
+    ]
+    if shape == "wide":
+        columns += [f"(hash(i + {n}) % 1000000) / 1000.0 AS f{n}" for n in range(1, WIDE_NUMERIC_COLUMNS + 1)]
+        columns += [f"'text_{n}_' || (hash(i * {n + 3}) % 1000) AS s{n}" for n in range(1, WIDE_TEXT_COLUMNS + 1)]
+    return f"SELECT {', '.join(columns)} FROM range({rows}) t(i)"
+
+
+def dataset_columns(shape: str) -> int:
+    return 6 + (WIDE_NUMERIC_COLUMNS + WIDE_TEXT_COLUMNS if shape == "wide" else 0)
+
+
+# XLSX files hold at most one sheet's worth of rows.
+def dataset_rows(rows: int, fmt: str) -> int:
+    return min(rows, EXCEL_MAX_ROWS - 1) if fmt == "xlsx" else rows
+
+
+def dataset_path(data_dir, rows, shape, fmt):
+    return os.path.join(data_dir, f"{shape}_{rows_label(rows)}.{fmt}")
+
+
+# Files are generated once per data dir and reused by later runs.
+def generate_dataset(data_dir, rows, shape, fmt):
+    path = dataset_path(data_dir, rows, shape, fmt)
+    if os.path.exists(path):
+        return path
+    import duckdb
+    from engine import arrow_reader, copy_statement, write_xlsx_streaming
+    os.makedirs(data_dir, exist_ok=True)
+    partial = path + ".partial"
+    sql = dataset_select(dataset_rows(rows, fmt), shape)
+    conn = duckdb.connect()
+    try:
+        if fmt == "csv":
+            conn.execute(copy_statement(sql, partial))
+        else:
+            write_xlsx_streaming(arrow_reader(conn, sql, 100_000), partial)
+    finally:
+        conn.close()
+    os.replace(partial, path)
+    return path
+
+
+# --- Measurement (child process) ---
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Samples RSS on a background thread while a step runs; falls back to the
+# process-wide high-water mark where /proc is unavailable.
+class RssSampler:
+    def __init__(self, interval=RSS_SAMPLE_S):
+        self.interval = interval
+        self.peak = 0
+        self.running = False
+        self.thread = None
+
+    def sample(self):
+        while self.running:
+            self.peak = max(self.peak, current_rss_bytes())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+class StepFailed(Exception):
+    pass
+
+
+# Drives one SQLExplorer through every step for a single dataset; dialogs are
+# answered in advance so the real GUI methods run unchanged.
+class DatasetBench:
+    def __init__(self, app, path, fmt, max_xlsx_cells):
+        import main
+        self.main = main
+        self.app = app
+        self.path = path
+        self.fmt = fmt
+        self.max_xlsx_cells = max_xlsx_cells
+        self.window = main.SQLExplorer()
+        # Background profiling would run concurrently with every timed step.
+        self.window.engine.on_registered = None
+        self.window.show()
+        self.steps = {}
+        self.answer_dialogs()
+
+    def answer_dialogs(self):
+        main = self.main
+
+        # Error boxes often open inside Qt slots, where raising would abort
+        # PyQt, so they are recorded and turned into a failed step afterwards.
+        def fail(_parent, title, message, *args):
+            self.dialog_errors.append(f"{title}: {message}")
+
+        self.dialog_errors = []
+        main.QMessageBox.critical = staticmethod(fail)
+        main.QMessageBox.warning = staticmethod(fail)
+        main.QFileDialog.getOpenFileName = staticmethod(lambda *a, **k: (self.path, ""))
+        main.QFileDialog.getSaveFileName = staticmethod(lambda *a, **k: (self.save_path, self.save_filter))
+        main.QInputDialog.getText = staticmethod(lambda *a, **k: ("t", True))
+        main.SheetPickerDialog.exec_ = lambda dialog: main.QDialog.Accepted
+        self.save_path, self.save_filter = None, ""
+
+    def wait_for(self, attr):
+        while getattr(self.window, attr) is not None:
+            self.app.processEvents()
+            time.sleep(POLL_S)
+        self.app.processEvents()
+
+    def measure(self, name, action, skip=None):
+        if skip:
+            self.steps[name] = {"skipped": skip}
+            return
+        started = time.perf_counter()
+        try:
+            with RssSampler() as rss:
+                action()
+                self.app.processEvents()
+            if self.dialog_errors:
+                raise StepFailed("; ".join(self.dialog_errors))
+        except Exception as ex:
+            self.steps[name] = {"error": str(ex) if isinstance(ex, StepFailed) else f"{type(ex).__name__}: {ex}"}
+            self.dialog_errors.clear()
+            return
+        self.steps[name] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "peak_rss_mb": round(rss.peak / 2**20, 1),
+        }
+
+    def run_sql(self, sql):
+        self.window.sql_editor.setPlainText(sql)
+        self.window.run_query()
+        self.wait_for("query_worker")
+        if self.window.current_result is None or self.window.current_result.sql != sql:
+            raise StepFailed(f"query did not produce a result: {self.window.query_status.text()}")
+
+    def export(self, method, suffix, save_filter):
+        self.save_path = os.path.join(tempfile.gettempdir(), f"bench_export_{os.getpid()}{suffix}")
+        self.save_filter = save_filter
+        try:
+            getattr(self.window, method)()
+            self.wait_for("job_worker")
+        finally:
+            if os.path.exists(self.save_path):
+                os.remove(self.save_path)
+
+    def plot(self, chart, x, y):
+        window = self.window
+        window.tabs.setCurrentIndex(window.viz_tab_index)
+        window.chart_type.setCurrentText(chart)
+        window.x_dropdown.setCurrentText(x)
+        window.y_dropdown.setCurrentText(y)
+        window.plot_chart()
+
+    def run(self):
+        window = self.window
+        self.measure("add_file", window.add_file)
+        if "t" not in window.engine.tables:
+            return self.steps
+        meta = window.engine.tables["t"]
+        cells = meta["rows"] * len(meta["columns"])
+        self.measure("run_query:aggregate", lambda: self.run_sql(
+            "SELECT city, category, COUNT(*) AS n, SUM(amount) AS total FROM t GROUP BY ALL ORDER BY total DESC"
+        ))
+        self.measure("run_query:scan", lambda: self.run_sql("SELECT * FROM t"))
+        if window.current_result is None:
+            return self.steps
+        self.measure("display_results", lambda: window.display_results(window.current_result))
+        self.measure("export_csv", lambda: self.export("export_csv", ".csv", "CSV (*.csv)"))
+        self.measure("export_xlsx", lambda: self.export("export_xlsx", ".xlsx", ""),
+                     skip=cells > self.max_xlsx_cells and f"{cells:,} cells exceed --max-xlsx-cells")
+        self.measure("plot_chart:bar", lambda: self.plot("Bar", "city", "amount"))
+        self.measure("plot_chart:line", lambda: self.plot("Line", "ts", "amount"))
+        self.measure("plot_chart:scatter", lambda: self.plot("Scatter", "id", "amount"))
+        window.close()
+        return self.steps
+
+
+def run_child(spec):
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication([sys.argv[0]])
+    bench = DatasetBench(app, spec["path"], spec["format"], spec["max_xlsx_cells"])
+    steps = bench.run()
+    print(json.dumps(steps))
+    return EXIT_OK
+
+
+def run_dataset(spec):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    with tempfile.TemporaryDirectory(prefix="bench_home_") as home:
+        env["HOME"] = env["USERPROFILE"] = home
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+            env=env, capture_output=True, text=True,
+        )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"error": (proc.stderr.strip().splitlines() or [f"exit code {proc.returncode}"])[-1]}
+    return json.loads(lines[-1])
+
+
+# --- Comparison ---
+def compare(results, baseline, thresholds):
+    regressions = []
+    for name, dataset in results.items():
+        before = baseline.get("results", {}).get(name, {}).get("steps", {})
+        for step, now in dataset.get("steps", {}).items():
+            then = before.get(step)
+            if not then or "seconds" not in then or "seconds" not in now:
+                continue
+            if (now["seconds"] > then["seconds"] * thresholds["time_ratio"]
+                    and now["seconds"] - then["seconds"] > thresholds["min_seconds"]):
+                regressions.append({"dataset": name, "step": step, "metric": "seconds",
+                                    "baseline": then["seconds"], "current": now["seconds"]})
+            if (now["peak_rss_mb"] > then["peak_rss_mb"] * thresholds["rss_ratio"]
+                    and now["peak_rss_mb"] - then["peak_rss_mb"] > thresholds["min_rss_mb"]):
+                regressions.append({"dataset": name, "step": step, "metric": "peak_rss_mb",
+                                    "baseline": then["peak_rss_mb"], "current": now["peak_rss_mb"]})
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_step(name, step, result):
+    if "seconds" in result:
+        text = f"{result['seconds']:9.3f} s  {result['peak_rss_mb']:8.1f} MB"
+    else:
+        text = f"{'skipped: ' + result['skipped'] if 'skipped' in result else 'error: ' + result['error']}"
+    print(f"{name:<18} {step:<22} {text}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, queries, rendering, export and plotting.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"row counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--shapes", default=DEFAULT_SHAPES, help=f"narrow and/or wide (default {DEFAULT_SHAPES})")
+    parser.add_argument("--formats", default=DEFAULT_FORMATS, help=f"csv and/or xlsx (default {DEFAULT_FORMATS})")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where generated files are kept")
+    parser.add_argument("--max-xlsx-cells", type=int, default=DEFAULT_MAX_XLSX_CELLS)
+    parser.add_argument("-o", "--out", help="results JSON (default bench_<revision>_<time>.json)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--time-ratio", type=float, help="allowed slowdown ratio per step")
+    parser.add_argument("--rss-ratio", type=float, help="allowed peak RSS growth ratio per step")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(json.loads(args.child))
+    sizes = [parse_rows(s) for s in args.sizes.split(",")]
+    shapes = [s.strip() for s in args.shapes.split(",")]
+    formats = [f.strip() for f in args.formats.split(",")]
+    if set(shapes) - {"narrow", "wide"} or set(formats) - {"csv", "xlsx"}:
+        parser.error("shapes are narrow/wide and formats are csv/xlsx")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    thresholds = dict(DEFAULT_THRESHOLDS, **(baseline or {}).get("thresholds", {}))
+    if args.time_ratio is not None:
+        thresholds["time_ratio"] = args.time_ratio
+    if args.rss_ratio is not None:
+        thresholds["rss_ratio"] = args.rss_ratio
+
+    results, failed = {}, False
+    for fmt in formats:
+        for shape in shapes:
+            for rows in sizes:
+                name = f"{fmt}-{shape}-{rows_label(rows)}"
+                columns = dataset_columns(shape)
+                if fmt == "xlsx" and dataset_rows(rows, fmt) * columns > args.max_xlsx_cells:
+                    results[name] = {"skipped": "file exceeds --max-xlsx-cells"}
+                    print(f"{name:<18} skipped (exceeds --max-xlsx-cells)", file=sys.stderr)
+                    continue
+                started = time.perf_counter()
+                path = generate_dataset(args.data_dir, rows, shape, fmt)
+                generated = time.perf_counter() - started
+                steps = run_dataset({"path": path, "format": fmt, "max_xlsx_cells": args.max_xlsx_cells})
+                if "error" in steps:
+                    print(f"{name:<18} failed: {steps['error']}", file=sys.stderr)
+                    results[name] = {"error": steps["error"]}
+                    failed = True
+                    continue
+                results[name] = {
+                    "format": fmt, "shape": shape, "rows": dataset_rows(rows, fmt), "columns": columns,
+                    "file_mb": round(os.path.getsize(path) / 2**20, 1),
+                    "generate_seconds": round(generated, 2), "steps": steps,
+                }
+                for step, result in steps.items():
+                    print_step(name, step, result)
+                    # A broken step has no timing to compare, so it fails the run itself.
+                    failed = failed or "error" in result
+
+    revision = git_revision()
+    report = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "thresholds": thresholds,
+        "results": results,
+    }
+    if baseline is not None:
+        report["baseline"] = {"path": args.baseline, "revision": baseline.get("revision")}
+        report["regressions"] = compare(results, baseline, thresholds)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['dataset']} {r['step']}: {r['metric']} "
+                  f"{r['baseline']} -> {r['current']}", file=sys.stderr)
+    out = args.out or f"bench_{revision or 'local'}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    if os.path.dirname(out):
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"results written to {out}", file=sys.stderr)
+    if failed:
+        return EXIT_BENCH_FAILED
+    return EXIT_REGRESSION if report.get("regressions") else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+# Headless runner: registers files, runs SQL files or NL prompts through the
+# same Engine as the desktop app and writes each result to a file or stdout.
+#
+#   python cli.py -t sales=data/sales.csv -t q=book.xlsx:Q1,Q2 -t logs='logs/*.parquet' \
+#       --sql-file report.sql --prompt "top 5 cities by revenue" --format parquet --out results/
+import argparse
+import os
+import sys
+import time
+
+from engine import (
+    DEFAULT_PAGE_SIZE, EXCEL_EXTENSIONS, LLM_ERROR_PREFIX, LLM_TIMEOUT_S, Engine,
+    arrow_reader, copy_statement, open_cursor, write_xlsx_streaming,
+)
+
+EXIT_OK = 0
+EXIT_QUERY_FAILED = 1
+EXIT_USAGE = 2  # argparse exits with 2 on its own errors
+EXIT_INGEST_FAILED = 3
+EXIT_LLM_FAILED = 4
+
+FORMATS = {"csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet", "xlsx": ".xlsx"}
+
+
+def parse_table_spec(spec: str):
+    alias, sep, target = spec.partition("=")
+    if not sep or not alias.strip() or not target:
+        raise argparse.ArgumentTypeError(f"expected ALIAS=PATH[:SHEET[,SHEET...]], got {spec!r}")
+    path, sheets = target, None
+    lowered = target.lower()
+    for ext in EXCEL_EXTENSIONS:
+        # Split on the colon after the workbook extension so drive letters survive.
+        i = lowered.find(ext + ":")
+        if i >= 0:
+            path, sheets = target[:i + len(ext)], target[i + len(ext) + 1:].split(",")
+            break
+    return alias.strip(), path, sheets
+
+
+def sql_file_job(path: str):
+    if not os.path.isfile(path):
+        raise argparse.ArgumentTypeError(f"no such SQL file: {path}")
+    return "sql-file", path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Run SQL or natural-language queries over local files without the GUI."
+    )
+    parser.add_argument("-t", "--table", dest="tables", action="append", default=[], type=parse_table_spec,
+                        metavar="ALIAS=PATH[:SHEETS]",
+                        help="register a CSV, a glob of CSV/Parquet files or workbook sheets (repeatable)")
+    parser.add_argument("-w", "--workspace", help="open or create a persistent DuckDB workspace")
+    parser.add_argument("--ingest", choices=["table", "view"], default="table",
+                        help="load files into native tables or query them through views")
+    add_duckdb_arguments(parser)
+    parser.add_argument("--sql-file", dest="jobs", action="append", type=sql_file_job,
+                        metavar="PATH", help="run the statements in a .sql file (repeatable)")
+    parser.add_argument("--sql", dest="jobs", action="append", type=lambda v: ("sql", v),
+                        metavar="SQL", help="run an inline SQL query (repeatable)")
+    parser.add_argument("--prompt", dest="jobs", action="append", type=lambda v: ("prompt", v),
+                        metavar="TEXT", help="generate SQL from a question with the LLM (repeatable)")
+    parser.add_argument("-f", "--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("-o", "--out",
+                        help="output file (single query) or directory; CSV goes to stdout when omitted")
+    parser.add_argument("--llm-timeout", type=int, default=LLM_TIMEOUT_S, metavar="SECONDS")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile every table first so NL prompts include column statistics")
+    parser.add_argument("--show-sql", action="store_true", help="print generated SQL to stderr")
+    parser.add_argument("--fail-fast", action="store_true", help="stop at the first failed query")
+    return parser
+
+
+def add_duckdb_arguments(parser):
+    parser.add_argument("--memory-limit", metavar="SIZE", help="DuckDB memory_limit, e.g. 4GB")
+    parser.add_argument("--threads", type=int, help="DuckDB worker threads")
+    parser.add_argument("--temp-dir", dest="temp_directory", metavar="DIR",
+                        help="where DuckDB spills when the memory limit is reached")
+
+
+def duckdb_settings(args):
+    return {"memory_limit": args.memory_limit, "threads": args.threads, "temp_directory": args.temp_directory}
+
+
+def open_engine(args):
+    engine = Engine(settings=duckdb_settings(args))
+    if args.workspace:
+        _, failed = engine.open_workspace(args.workspace)
+        for alias, error in failed.items():
+            print(f"warning: workspace alias {alias}: {error}", file=sys.stderr)
+    return engine
+
+
+def job_name(kind, value, index):
+    if kind == "sql-file":
+        return os.path.splitext(os.path.basename(value))[0]
+    return f"query{index}"
+
+
+def output_path(out, name, fmt, job_count):
+    if out is None:
+        return None
+    if job_count == 1 and not os.path.isdir(out) and os.path.splitext(out)[1]:
+        return out
+    os.makedirs(out, exist_ok=True)
+    return os.path.join(out, name + FORMATS[fmt])
+
+
+def write_csv_stdout(reader):
+    import pyarrow.csv as pa_csv
+    rows, first = 0, True
+    for batch in reader:
+        pa_csv.write_csv(batch, sys.stdout.buffer, pa_csv.WriteOptions(include_header=first))
+        rows += batch.num_rows
+        first = False
+    sys.stdout.buffer.flush()
+    return rows
+
+
+# Runs every statement of the job; the last one is exported when it returns
+# rows. Returns the number of rows written.
+def run_job(engine, sql, path, fmt):
+    statements = engine.conn.extract_statements(sql)
+    if not statements:
+        raise ValueError("no SQL statement to run")
+    cursor = open_cursor(engine.conn)
+    try:
+        for statement in statements[:-1]:
+            cursor.execute(statement.query)
+        last = statements[-1]
+        if last.type.name != "SELECT":
+            cursor.execute(last.query)
+            engine.result_cache.clear()
+            return 0
+        if path is None:
+            return write_csv_stdout(arrow_reader(cursor, last.query, DEFAULT_PAGE_SIZE))
+        if fmt == "xlsx":
+            written = [0]
+            reader = arrow_reader(cursor, last.query, DEFAULT_PAGE_SIZE)
+            write_xlsx_streaming(reader, path, on_progress=lambda rows: written.__setitem__(0, rows))
+            return written[0]
+        return cursor.execute(copy_statement(last.query, path)).fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.jobs:
+        parser.error("nothing to run: pass --sql-file, --sql or --prompt")
+    if args.out is None and args.format != "csv":
+        parser.error(f"--format {args.format} needs --out")
+
+    started = time.perf_counter()
+    engine = open_engine(args)
+    engine.default_kind = args.ingest
+    for alias, path, sheets in args.tables:
+        try:
+            aliases = engine.register_path(alias, path, sheets)
+        except Exception as ex:
+            print(f"error: could not register {alias} from {path}: {ex}", file=sys.stderr)
+            engine.close()
+            return EXIT_INGEST_FAILED
+        for name in aliases:
+            print(f"registered {name}: {engine.tables[name]['rows']:,} rows", file=sys.stderr)
+    if args.profile:
+        for alias in list(engine.tables):
+            engine.profile_alias(alias)
+
+    status, failed = EXIT_OK, 0
+    for index, (kind, value) in enumerate(args.jobs, 1):
+        name = job_name(kind, value, index)
+        job_started = time.perf_counter()
+        if kind == "sql-file":
+            try:
+                with open(value, encoding="utf-8") as fh:
+                    sql = fh.read()
+            except (OSError, UnicodeDecodeError) as ex:
+                print(f"error: {name}: could not read {value}: {ex}", file=sys.stderr)
+                status, failed = status or EXIT_USAGE, failed + 1
+                if args.fail_fast:
+                    break
+                continue
+        elif kind == "prompt":
+            sql = engine.generate_sql(value, timeout=args.llm_timeout)
+            if sql.startswith(LLM_ERROR_PREFIX):
+                print(f"error: {name}: {sql}", file=sys.stderr)
+                status, failed = status or EXIT_LLM_FAILED, failed + 1
+                if args.fail_fast:
+                    break
+                continue
+            if args.show_sql:
+                print(f"-- {name}\n{sql}", file=sys.stderr)
+        else:
+            sql = value
+        try:
+            rows = run_job(engine, sql, output_path(args.out, name, args.format, len(args.jobs)), args.format)
+        except Exception as ex:
+            print(f"error: {name}: {ex}", file=sys.stderr)
+            status, failed = status or EXIT_QUERY_FAILED, failed + 1
+            if args.fail_fast:
+                break
+            continue
+        print(f"{name}: {rows:,} rows in {time.perf_counter() - job_started:.3f} s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    print(f"{len(args.jobs)} jobs, {failed} failed, {elapsed:.2f} s total "
+          f"(NL cache {engine.sql_cache.hits} hits / {engine.sql_cache.misses} misses)", file=sys.stderr)
+    engine.close()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1432 @@
+# Query engine shared by the desktop app (main.py) and the command-line runner
+# (cli.py): catalog of registered aliases, ingestion, caches and the NL-to-SQL
+# path. Nothing here imports Qt, and duckdb, pandas and openai are imported
+# where they are first needed.
+import os
+import bisect
+import glob
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+client = None
+
+
+def get_client():
+    global client
+    if client is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise RuntimeError("OPENAI_API_KEY is not set (environment or .env file)")
+        from openai import OpenAI
+        # stream_completion owns the deadline and the retries; SDK retries
+        # would stack on top of them and outlive Cancel.
+        client = OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ.get("OPENAI_BASE_URL"),
+                        max_retries=0)
+    return client
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def relation_sql(alias: str, kind: str, scan: str) -> str:
+    return f"CREATE OR REPLACE {kind.upper()} {quote_ident(alias)} AS SELECT * FROM {scan}"
+
+
+def describe_relation(conn, name: str) -> list:
+    rows = conn.execute(f"DESCRIBE {quote_ident(name)}").fetchall()
+    return [(r[0], r[1]) for r in rows]
+
+
+def relation_row_count(conn, name: str) -> int:
+    # Native tables keep an exact row count in the catalog; views need a scan.
+    row = conn.execute(
+        "SELECT estimated_size FROM duckdb_tables() WHERE table_name = ?", [name]
+    ).fetchone()
+    if row is not None:
+        return row[0]
+    return conn.execute(f"SELECT COUNT(*) FROM {quote_ident(name)}").fetchone()[0]
+
+
+# Estimated compressed size of a native table. Callers checkpoint first so
+# fresh in-memory tables are compressed into blocks. On-disk blocks have ids;
+# in-memory ones report -1 and segments not yet checkpointed report none, so
+# there every non-constant segment starting a block counts as one block.
+DUCKDB_BLOCK_SIZE = 262_144
+
+
+def table_storage_bytes(conn, name: str) -> int:
+    block_size = conn.execute(
+        "SELECT block_size FROM pragma_database_size() WHERE database_name = current_database()"
+    ).fetchone()
+    blocks = conn.execute(
+        "SELECT count(DISTINCT block_id) FILTER (WHERE block_id >= 0) "
+        "+ coalesce(sum(len(additional_block_ids)), 0) "
+        "+ count(*) FILTER (WHERE coalesce(block_id, -1) < 0 AND coalesce(block_offset, 0) = 0 "
+        "AND compression <> 'Constant') "
+        f"FROM pragma_storage_info({quote_literal(name)})"
+    ).fetchone()[0]
+    return blocks * ((block_size and block_size[0]) or DUCKDB_BLOCK_SIZE)
+
+
+# Every query gets its own cursor (a separate DuckDB client context), so the
+# GUI, workers and service slots never share one. Tables live only in DuckDB,
+# which every cursor sees.
+def open_cursor(conn):
+    return conn.cursor()
+
+
+# Runs sql on cursor and returns its rows as a pyarrow RecordBatchReader.
+def arrow_reader(cursor, sql: str, batch_size: int):
+    return cursor.execute(sql).to_arrow_reader(batch_size)
+
+
+# The statement whose rows a query returns, without trailing semicolons, so
+# it can be wrapped as "FROM (\n...\n)". The newlines keep a trailing line
+# comment from swallowing the closing parenthesis.
+def last_statement_sql(sql: str) -> str:
+    import duckdb
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error:
+        return sql.strip()
+    query = statements[-1].query if statements and statements[-1].query.strip() else sql
+    end = len(query)
+    # tokenize() skips comments, so this also drops "; -- note" endings.
+    for offset, _ in reversed(duckdb.tokenize(query)):
+        if not query.startswith(";", offset):
+            break
+        end = offset
+    return query[:end].strip()
+
+
+DEFAULT_PAGE_SIZE = 10_000
+DEFAULT_MEMORY_CAP_MB = 512
+
+
+# Cursor-backed query result that pulls Arrow record batches one page at a time.
+# Loading stops once the pages held in memory reach the memory cap.
+class QueryResult:
+    def __init__(self, conn, sql, page_size=DEFAULT_PAGE_SIZE, memory_cap_mb=DEFAULT_MEMORY_CAP_MB, timings=None):
+        self.conn = conn
+        self.sql = sql
+        self.select_sql = last_statement_sql(sql)
+        self.page_size = page_size
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.cursor = self.open()
+        self.reader = None
+        self.columns = []
+        self.dtypes = None
+        self.pages = []
+        self.page_columns = []
+        self.offsets = []
+        self.row_count = 0
+        self.memory_bytes = 0
+        self.exhausted = False
+        self.truncated = False
+        self.timings = timings
+
+    def open(self):
+        return open_cursor(self.conn)
+
+    def span(self, phase):
+        return self.timings.span(phase) if self.timings is not None else nullcontext()
+
+    def execute(self):
+        with self.span("execute"):
+            self.reader = arrow_reader(self.cursor, self.sql, self.page_size)
+        self.columns = list(self.reader.schema.names)
+        self.dtypes = self.reader.schema.empty_table().to_pandas().dtypes
+        self.fetch_page()
+        return self
+
+    def has_more(self):
+        return not (self.exhausted or self.truncated)
+
+    def fetch_page(self):
+        if not self.has_more():
+            return 0
+        with self.span("fetch"):
+            return self._fetch_page()
+
+    def _fetch_page(self):
+        batches, rows = [], 0
+        while rows < self.page_size:
+            try:
+                batch = self.reader.read_next_batch()
+            except StopIteration:
+                self.exhausted = True
+                self.close()
+                break
+            batches.append(batch)
+            rows += batch.num_rows
+        if not rows:
+            return 0
+        import pyarrow as pa
+        page = pa.Table.from_batches(batches).to_pandas()
+        self.offsets.append(self.row_count)
+        self.pages.append(page)
+        self.page_columns.append([page[c].array for c in page.columns])
+        self.row_count += rows
+        self.memory_bytes += int(page.memory_usage(deep=True).sum())
+        if self.memory_bytes >= self.memory_cap and not self.exhausted:
+            self.truncated = True
+            self.close()
+        return rows
+
+    def cell(self, row, col):
+        i = bisect.bisect_right(self.offsets, row) - 1
+        return self.page_columns[i][col][row - self.offsets[i]]
+
+    def is_complete(self):
+        return self.exhausted and not self.truncated
+
+    def stream(self, columns=None):
+        # A complete result is replayed from memory; otherwise the SQL runs
+        # again on a fresh cursor so the grid's own cursor is left untouched.
+        if self.is_complete():
+            for page in self.pages:
+                yield page if columns is None else page[columns]
+            return
+        sql = self.select_sql
+        if columns is not None:
+            sql = f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM (\n{self.select_sql}\n)"
+        cursor = open_cursor(self.conn)
+        try:
+            for batch in arrow_reader(cursor, sql, self.page_size):
+                yield batch.to_pandas()
+        finally:
+            cursor.close()
+
+    def collect(self, columns=None):
+        import pandas as pd
+        frames, used = [], 0
+        for page in self.stream(columns):
+            frames.append(page)
+            used += int(page.memory_usage(deep=True).sum())
+            if used >= self.memory_cap:
+                return pd.concat(frames, ignore_index=True), True
+        if not frames:
+            return self.dtypes_frame(columns), False
+        return pd.concat(frames, ignore_index=True), False
+
+    def dtypes_frame(self, columns=None):
+        import pandas as pd
+        df = pd.DataFrame({c: pd.Series(dtype=t) for c, t in self.dtypes.items()})
+        return df if columns is None else df[columns]
+
+    # Called from another thread to abort execute() or a page fetch.
+    def interrupt(self):
+        cursor = self.cursor
+        if cursor is not None:
+            cursor.interrupt()
+
+    def close(self):
+        if self.cursor is not None:
+            self.cursor.close()
+            self.cursor = None
+            self.reader = None
+
+
+LLM_MODEL = "gpt-4o-mini"
+LLM_TIMEOUT_S = 30
+LLM_MAX_ATTEMPTS = 3
+LLM_BACKOFF_S = 1.0
+LLM_ERROR_PREFIX = "-- Error generating SQL"
+APP_DIR = os.path.join(os.path.expanduser("~"), ".query_flex")
+NL_CACHE_PATH = os.path.join(APP_DIR, "nl_sql_cache.json")
+NL_CACHE_MAX_ENTRIES = 500
+
+
+# --- DuckDB settings ---
+# Empty values fall back to DuckDB's defaults: 80% of RAM, one thread per
+# core, and spilling only next to a workspace file.
+DUCKDB_SETTINGS_PATH = os.path.join(APP_DIR, "duckdb_settings.json")
+DUCKDB_SETTING_NAMES = ("memory_limit", "threads", "temp_directory")
+
+
+def load_duckdb_settings() -> dict:
+    try:
+        with open(DUCKDB_SETTINGS_PATH, encoding="utf-8") as fh:
+            stored = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return {name: stored.get(name) for name in DUCKDB_SETTING_NAMES}
+
+
+def save_duckdb_settings(settings):
+    os.makedirs(APP_DIR, exist_ok=True)
+    with open(DUCKDB_SETTINGS_PATH, "w", encoding="utf-8") as fh:
+        json.dump(settings, fh, indent=2)
+
+
+def apply_duckdb_settings(conn, settings):
+    for name in DUCKDB_SETTING_NAMES:
+        value = settings.get(name)
+        if value in (None, "", 0):
+            conn.execute(f"RESET {name}")
+        elif name == "threads":
+            conn.execute(f"SET threads = {int(value)}")
+        else:
+            conn.execute(f"SET {name} = {quote_literal(value)}")
+
+
+def duckdb_memory_bytes(conn) -> int:
+    return conn.execute("SELECT sum(memory_usage_bytes) FROM duckdb_memory()").fetchone()[0] or 0
+
+
+# --- Run timings ---
+# One RunTimings follows a run from prompt to plot. Workers on other threads
+# add spans to it; the GUI shows and logs it once the result is on screen.
+TIMING_PHASES = ("prompt", "llm", "execute", "fetch", "render", "plot")
+TIMING_LOG_PATH = os.path.join(APP_DIR, "timings.jsonl")
+TIMING_LOG_MAX_BYTES = 5 * 1024 * 1024
+TIMING_LOG_BACKUPS = 3
+CPROFILE_DIR = os.path.join(APP_DIR, "cprofiles")
+
+
+def format_seconds(seconds: float) -> str:
+    return f"{seconds * 1000:.0f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+
+class RunTimings:
+    def __init__(self, label, capture=False):
+        self.label = label
+        self.started = time.time()
+        self.spans = {}
+        self.lock = threading.Lock()
+        # cProfile only sees the thread it is enabled on, so each span gets
+        # its own profiler and save_cprofile() merges them.
+        self.profiles = [] if capture else None
+
+    @contextmanager
+    def span(self, phase):
+        profiler = None
+        if self.profiles is not None:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            if profiler is not None:
+                profiler.disable()
+            with self.lock:
+                self.spans[phase] = self.spans.get(phase, 0.0) + elapsed
+                if profiler is not None and self.profiles is not None:
+                    self.profiles.append(profiler)
+
+    def total(self):
+        return sum(self.spans.values())
+
+    def summary(self):
+        parts = [f"{phase} {format_seconds(self.spans[phase])}" for phase in TIMING_PHASES if phase in self.spans]
+        return " · ".join(parts) + f" = {format_seconds(self.total())}" if parts else ""
+
+    def record(self, **extra):
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "label": self.label,
+            "spans": {phase: round(seconds, 4) for phase, seconds in self.spans.items()},
+            "total": round(self.total(), 4),
+            **extra,
+        }
+
+    # Writes the merged profile of every span so far and stops capturing.
+    def save_cprofile(self):
+        with self.lock:
+            profiles, self.profiles = self.profiles, None
+        if not profiles:
+            return None
+        import pstats
+        stats = pstats.Stats(profiles[0])
+        if len(profiles) > 1:
+            stats.add(*profiles[1:])
+        os.makedirs(CPROFILE_DIR, exist_ok=True)
+        path = os.path.join(CPROFILE_DIR, time.strftime("run_%Y%m%d_%H%M%S.prof", time.localtime(self.started)))
+        stats.dump_stats(path)
+        return path
+
+
+def append_timing_log(record, path=TIMING_LOG_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path) and os.path.getsize(path) >= TIMING_LOG_MAX_BYTES:
+        for i in range(TIMING_LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(record) + "\n")
+
+
+PROMPT_TEMPLATE = """
+You are a SQL assistant. Convert the natural language question into a valid DuckDB SQL query.
+
+Schema:
+{schema}
+
+Sample data:
+{samples}
+
+Additional context:
+{context}
+
+Question: {question}
+
+Rules:
+- Only use the provided tables/columns.
+- Qualify ambiguous column names with table alias if needed.
+- Return ONLY the SQL query (no explanations, no markdown, no ``` fences).
+"""
+
+
+def count_tokens(text: str) -> int:
+    try:
+        import tiktoken
+    except ImportError:
+        return (len(text) + 3) // 4  # rough average for English and SQL
+    return len(tiktoken.get_encoding("cl100k_base").encode(text))
+
+
+# Schema pruning: with large catalogs only the top-k tables by lexical
+# relevance to the question (and at most MAX_PROMPT_COLUMNS of their columns)
+# go into the prompt.
+PROMPT_TOP_K_TABLES = 8
+MAX_PROMPT_COLUMNS = 40
+DISTINCT_VALUE_SAMPLE_ROWS = 5_000
+DISTINCT_VALUES_PER_COLUMN = 20
+TERM_WEIGHTS = {"name": 3.0, "column": 2.0, "context": 1.0, "value": 1.0}
+STOPWORDS = {
+    "the", "and", "for", "with", "from", "what", "which", "who", "how", "many", "much", "per",
+    "show", "list", "give", "get", "find", "all", "each", "by", "of", "in", "on", "to", "is",
+    "are", "was", "were", "me", "top", "most", "least", "total", "number", "count", "average",
+}
+
+
+def lexical_terms(text: str) -> set:
+    terms = set()
+    for word in re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+", str(text)):
+        word = word.lower()
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        terms.add(word[:-1] if len(word) > 3 and word.endswith("s") else word)
+    return terms
+
+
+def sample_distinct_values(conn, alias: str, columns) -> dict:
+    text_columns = [c for c, t in columns if t == "VARCHAR"]
+    if not text_columns:
+        return {}
+    select = ", ".join(quote_ident(c) for c in text_columns)
+    df = conn.execute(
+        f"SELECT {select} FROM {quote_ident(alias)} LIMIT {DISTINCT_VALUE_SAMPLE_ROWS}"
+    ).df()
+    return {c: [str(v) for v in df[c].dropna().unique()[:DISTINCT_VALUES_PER_COLUMN]] for c in text_columns}
+
+
+# Prompt fragments per alias, built when a table is registered instead of on
+# every LLM call. Each rebuild bumps the alias's version. The same pass
+# indexes the alias's terms for relevance-based pruning.
+class SchemaDigests:
+    def __init__(self, entries=None):
+        self.entries = dict(entries or {})
+
+    def update(self, alias, meta):
+        cols = ", ".join(f"{c} ({t})" for c, t in meta["columns"])
+        parts = {
+            "schema": f"Table {alias}: {cols}",
+            "samples": f"Samples from {alias}:\n{meta['sample'].to_csv(index=False)}",
+            "context": f"Context for {alias}: {meta['context']}" if meta.get("context") else "",
+        }
+        profile = meta.get("profile") or {}
+        stats = {c: f"{alias}.{c}: {describe_column_stats(profile[c])}" for c, _ in meta["columns"] if c in profile}
+        # Profile stats only refine the prompt and are left out of the hash: a
+        # background profile finishing between Preview and Run must not change
+        # the NL cache key, or Run would ask the model again.
+        text = "\x1e".join(parts.values())
+        values = meta.get("values", {})
+        column_terms = {
+            c: lexical_terms(c) | set().union(*(lexical_terms(v) for v in values.get(c, [])))
+            for c, _ in meta["columns"]
+        }
+        fields = {
+            "name": lexical_terms(alias),
+            "column": set().union(*(lexical_terms(c) for c, _ in meta["columns"])),
+            "context": lexical_terms(meta.get("context", "")),
+            "value": set().union(*column_terms.values()),
+        }
+        terms = {}
+        for field, field_terms in fields.items():
+            for term in field_terms:
+                terms[term] = terms.get(term, 0.0) + TERM_WEIGHTS[field]
+        previous = self.entries.get(alias)
+        self.entries[alias] = {
+            **parts,
+            "version": previous["version"] + 1 if previous else 1,
+            "hash": hashlib.sha256(text.encode()).hexdigest(),
+            "columns": meta["columns"],
+            "sample_df": meta["sample"],
+            "terms": terms,
+            "column_terms": column_terms,
+            "stats": stats,
+        }
+
+    def discard(self, alias):
+        self.entries.pop(alias, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def snapshot(self):
+        return SchemaDigests(self.entries)
+
+    # Returns [(alias, columns or None for all)] in registration order.
+    def select(self, question: str, top_k=PROMPT_TOP_K_TABLES, max_columns=MAX_PROMPT_COLUMNS):
+        import math
+        q_terms = lexical_terms(question)
+        n = len(self.entries)
+        idf = {
+            t: math.log(1 + n / (1 + sum(t in e["terms"] for e in self.entries.values())))
+            for t in q_terms
+        }
+        scores = {
+            alias: sum(idf[t] * e["terms"].get(t, 0.0) for t in q_terms)
+            for alias, e in self.entries.items()
+        }
+        ranked = sorted(self.entries, key=lambda a: -scores[a])  # stable: ties keep registration order
+        # Unrelated tables only pad the prompt; fall back to the first k when
+        # nothing matches so vague questions still get some schema.
+        chosen = {a for a in ranked[:top_k] if scores[a] > 0} or set(ranked[:top_k])
+        selection = []
+        for alias, entry in self.entries.items():
+            if alias not in chosen:
+                continue
+            columns = None
+            if len(entry["columns"]) > max_columns:
+                col_scores = {c: sum(idf[t] for t in q_terms & terms) for c, terms in entry["column_terms"].items()}
+                keep = set(sorted(col_scores, key=lambda c: -col_scores[c])[:max_columns])
+                columns = [c for c, _ in entry["columns"] if c in keep]
+            selection.append((alias, columns))
+        return selection
+
+    def fragments(self, alias, columns):
+        entry = self.entries[alias]
+        stats = [line for c, line in entry["stats"].items() if columns is None or c in columns]
+        context = "\n".join(filter(None, [entry["context"], *stats]))
+        if columns is None:
+            return entry["schema"], entry["samples"], context
+        dtypes = dict(entry["columns"])
+        cols = ", ".join(f"{c} ({dtypes[c]})" for c in columns)
+        omitted = len(entry["columns"]) - len(columns)
+        return (
+            f"Table {alias}: {cols} (+{omitted} less relevant columns omitted)",
+            f"Samples from {alias}:\n{entry['sample_df'][columns].to_csv(index=False)}",
+            context,
+        )
+
+    def fingerprint(self, selection=None) -> str:
+        if selection is None:
+            selection = [(alias, None) for alias in self.entries]
+        h = hashlib.sha256()
+        for alias, columns in sorted(selection, key=lambda item: item[0]):
+            h.update(f"{alias}\x1f{self.entries[alias]['hash']}\x1f{columns}\x1c".encode())
+        return h.hexdigest()
+
+    def build_prompt(self, question: str, selection=None) -> str:
+        if selection is None:
+            selection = self.select(question)
+        schema, samples, context = zip(*(self.fragments(a, cols) for a, cols in selection)) if selection else ((), (), ())
+        included = ", ".join(alias for alias, _ in selection)
+        header = f"Tables included ({len(selection)} of {len(self.entries)}): {included}\n"
+        return PROMPT_TEMPLATE.format(
+            schema=header + "\n".join(schema),
+            samples="\n".join(samples),
+            context="\n".join(filter(None, context)),
+            question=question,
+        )
+
+
+# Prompt -> SQL answers kept on disk with least-recently-used eviction.
+class SQLCache:
+    def __init__(self, path=NL_CACHE_PATH, max_entries=NL_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # the query service answers NL requests concurrently
+        try:
+            with open(path, encoding="utf-8") as fh:
+                self.entries.update(json.load(fh))
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def make_key(prompt: str, fingerprint: str, model: str) -> str:
+        return hashlib.sha256("\x00".join([model, fingerprint, prompt]).encode()).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            sql = self.entries.get(key)
+            if sql is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            self.save()
+            return sql
+
+    def put(self, key, sql):
+        with self.lock:
+            self.entries[key] = sql
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.entries, fh)
+        os.replace(tmp_path, self.path)
+
+
+DEFAULT_RESULT_CACHE_MB = 256
+# Results of these can change without any registered alias changing.
+VOLATILE_SQL = re.compile(
+    r"\b(random|uuid|gen_random_uuid|setseed|now|today|current_date|current_time|current_timestamp"
+    r"|read_\w+|glob|sniff_csv)\b|\bfrom\s+'",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    # Collapse whitespace outside string literals and drop trailing semicolons.
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";").strip())
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p) for i, p in enumerate(parts))
+
+
+# DuckDB runs every statement in a string, so a query only counts as read-only
+# when it is exactly one SELECT (which covers WITH, FROM, VALUES, DESCRIBE...).
+def is_read_only_sql(sql: str) -> bool:
+    import duckdb
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error:
+        return False
+    return len(statements) == 1 and statements[0].type == duckdb.StatementType.SELECT
+
+
+def referenced_aliases(sql: str, aliases) -> set:
+    words = {w.strip('"').lower() for w in re.findall(r'"(?:[^"]|"")+"|[A-Za-z_][A-Za-z0-9_$]*', sql)}
+    return {a for a in aliases if a.lower() in words}
+
+
+# Executed QueryResults kept for re-runs of the same SQL. Keys carry the
+# version of every alias the SQL mentions, and entries are dropped when one of
+# those aliases is re-registered, renamed or removed. Only complete results
+# are kept: one still streaming holds its cursor, and whatever DuckDB buffers
+# for it, outside the budget.
+class ResultCache:
+    def __init__(self, budget_mb=DEFAULT_RESULT_CACHE_MB):
+        self.budget = budget_mb * 1024 * 1024
+        self.entries = OrderedDict()
+        self.pinned = None  # the result on screen; closed by its owner, not here
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(sql: str, versions: dict):
+        return normalize_sql(sql), tuple(sorted(versions.items()))
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, result, aliases):
+        self.entries[key] = (result, set(aliases))
+        self.entries.move_to_end(key)
+        self.trim()
+
+    def holds(self, result):
+        return any(r is result for r, _ in self.entries.values())
+
+    def memory_bytes(self):
+        return sum(r.memory_bytes for r, _ in self.entries.values())
+
+    def trim(self):
+        while self.entries and self.memory_bytes() > self.budget:
+            self.evict(next(iter(self.entries)))
+
+    def invalidate(self, alias):
+        for key in [k for k, (_, aliases) in self.entries.items() if alias in aliases]:
+            self.evict(key)
+
+    def clear(self):
+        for key in list(self.entries):
+            self.evict(key)
+
+    def evict(self, key):
+        result, _ = self.entries.pop(key)
+        if result is not self.pinned:
+            result.close()
+
+
+WORKSPACE_META_TABLE = "__queryflex_tables"
+
+
+_digest_memo = {}
+
+
+def file_digest(path: str) -> str:
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key in _digest_memo:
+        return _digest_memo[memo_key]
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    _digest_memo[memo_key] = h.hexdigest()
+    return _digest_memo[memo_key]
+
+
+def is_glob(path: str) -> bool:
+    return any(ch in path for ch in "*?[")
+
+
+def glob_files(pattern: str) -> list:
+    return sorted(f for f in glob.glob(pattern, recursive=True) if os.path.isfile(f))
+
+
+def source_state(path: str, with_hash=True) -> dict:
+    if is_glob(path):
+        # For a glob the "hash" covers the file listing (names, sizes, mtimes),
+        # which is enough to notice added, removed or rewritten shards.
+        stats = [(f, os.stat(f)) for f in glob_files(path)]
+        listing = "\n".join(f"{f}\t{st.st_size}\t{st.st_mtime_ns}" for f, st in stats)
+        return {
+            "size": sum(st.st_size for _, st in stats),
+            "mtime": max((st.st_mtime for _, st in stats), default=0.0),
+            "hash": hashlib.sha256(listing.encode()).hexdigest(),
+        }
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime, "hash": file_digest(path) if with_hash else None}
+
+
+# Size and mtime are checked first; the content hash is only computed when
+# they disagree, so an untouched multi-GB source costs one stat() on reopen.
+def source_changed(path: str, size, mtime, digest) -> bool:
+    if is_glob(path):
+        return source_state(path)["hash"] != digest
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False  # source is gone; keep the stored copy
+    if st.st_size == size and st.st_mtime == mtime:
+        return False
+    if st.st_size != size:
+        return True
+    return file_digest(path) != digest
+
+
+EXCEL_CACHE_DIR = os.path.join(APP_DIR, "excel_cache")
+EXCEL_PARALLEL_SHEETS = 4
+
+
+# Converted sheets live under excel_cache/<workbook sha256>/, so an edited
+# workbook can never be served from a stale cache entry.
+def excel_cache_path(digest: str, sheet: str) -> str:
+    sheet_key = hashlib.sha1(sheet.encode()).hexdigest()[:16]
+    return os.path.join(EXCEL_CACHE_DIR, digest, f"{sheet_key}.parquet")
+
+
+def cached_sheet_names(digest: str):
+    try:
+        with open(os.path.join(EXCEL_CACHE_DIR, digest, "sheets.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def save_sheet_names(digest: str, sheet_names: list):
+    os.makedirs(os.path.join(EXCEL_CACHE_DIR, digest), exist_ok=True)
+    with open(os.path.join(EXCEL_CACHE_DIR, digest, "sheets.json"), "w", encoding="utf-8") as fh:
+        json.dump(sheet_names, fh)
+
+
+def write_parquet_cache(conn, df, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    cursor = conn.cursor()
+    try:
+        cursor.register("__queryflex_sheet", df)
+        cursor.execute(f"COPY __queryflex_sheet TO {quote_literal(tmp_path)} (FORMAT PARQUET)")
+    finally:
+        cursor.close()
+    os.replace(tmp_path, path)
+
+
+def sheet_alias(alias: str, sheet: str) -> str:
+    suffix = re.sub(r"\W+", "_", sheet).strip("_")
+    return f"{alias}_{suffix}"
+
+
+def staging_alias(alias: str) -> str:
+    return f"__queryflex_staging_{alias}"
+
+
+def bulk_scan_expression(pattern: str, with_filename: bool) -> str:
+    reader = "read_parquet" if pattern.lower().endswith(".parquet") else "read_csv_auto"
+    options = ", union_by_name = true"
+    if with_filename:
+        options += ", filename = true"
+    return f"{reader}({quote_literal(pattern)}{options})"
+
+
+def source_display_name(path: str) -> str:
+    if is_glob(path):
+        return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+    return os.path.basename(path)
+
+
+EXPORT_FILTERS = "CSV (*.csv);;Gzip CSV (*.csv.gz);;Parquet (*.parquet)"
+
+
+def copy_statement(sql: str, path: str) -> str:
+    lowered = path.lower()
+    if lowered.endswith(".parquet"):
+        options = "FORMAT PARQUET"
+    elif lowered.endswith(".gz"):
+        options = "FORMAT CSV, HEADER, COMPRESSION GZIP"
+    else:
+        options = "FORMAT CSV, HEADER"
+    return f"COPY (\n{last_statement_sql(sql)}\n) TO {quote_literal(path)} ({options})"
+
+
+EXCEL_MAX_ROWS = 1_048_576
+
+
+def xlsx_cell_writers(workbook, schema):
+    import pyarrow as pa
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    datetime_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    writers = []
+    for dtype in schema.types:
+        if pa.types.is_boolean(dtype):
+            writers.append(lambda ws, r, c, v: ws.write_boolean(r, c, v))
+        elif pa.types.is_integer(dtype) or pa.types.is_floating(dtype) or pa.types.is_decimal(dtype):
+            writers.append(lambda ws, r, c, v: ws.write_number(r, c, float(v)))
+        elif pa.types.is_date(dtype):
+            writers.append(lambda ws, r, c, v: ws.write_datetime(r, c, v, date_format))
+        elif pa.types.is_timestamp(dtype):
+            writers.append(lambda ws, r, c, v: ws.write_datetime(r, c, v, datetime_format))
+        else:
+            writers.append(lambda ws, r, c, v: ws.write_string(r, c, str(v)))
+    return writers
+
+
+# Writes rows in order (required by constant_memory) and starts a new sheet
+# whenever the current one reaches Excel's row limit. Returns the sheet count.
+def write_xlsx_streaming(reader, path, on_progress=None, should_stop=None):
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "remove_timezone": True,
+        "nan_inf_to_errors": True,
+    })
+    try:
+        names = list(reader.schema.names)
+        writers = xlsx_cell_writers(workbook, reader.schema)
+        sheet, row, total = None, EXCEL_MAX_ROWS, 0
+        for batch in reader:
+            if should_stop is not None and should_stop():
+                raise InterruptedError("Export cancelled")
+            columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+            for values in zip(*columns):
+                if row >= EXCEL_MAX_ROWS:
+                    sheet = workbook.add_worksheet(f"Sheet{len(workbook.worksheets()) + 1}")
+                    sheet.write_row(0, 0, names)
+                    row = 1
+                for col, value in enumerate(values):
+                    if value is not None:
+                        writers[col](sheet, row, col, value)
+                row += 1
+            total += batch.num_rows
+            if on_progress is not None:
+                on_progress(total)
+        if sheet is None:
+            workbook.add_worksheet("Sheet1").write_row(0, 0, names)
+        return len(workbook.worksheets())
+    finally:
+        workbook.close()
+
+
+PROFILE_CACHE_DIR = os.path.join(APP_DIR, "profiles")
+PROFILE_TOP_VALUES = 3
+
+
+# Profiles are keyed by the source's path, sheet, scan and size/mtime (or
+# listing hash for globs), so a rewritten file is profiled again. Relations
+# without a file on disk get no key and are profiled every session.
+def profile_cache_key(meta: dict):
+    try:
+        state = source_state(meta["path"], with_hash=False)
+    except OSError:
+        return None
+    parts = [meta["path"], meta["sheet"], meta.get("scan") or "", str(state["size"]),
+             str(state["mtime"]), state["hash"] or ""]
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+
+def load_profile(key):
+    if key is None:
+        return None
+    try:
+        with open(os.path.join(PROFILE_CACHE_DIR, f"{key}.json"), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(key, profile):
+    if key is None:
+        return
+    os.makedirs(PROFILE_CACHE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_CACHE_DIR, f"{key}.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(profile, fh)
+    os.replace(path + ".tmp", path)
+
+
+def profile_relation(cursor, alias: str) -> dict:
+    rows = cursor.execute(f"SUMMARIZE {quote_ident(alias)}").fetchall()
+    names = [d[0] for d in cursor.description]
+    profile = {}
+    for row in rows:
+        stats = dict(zip(names, row))
+        profile[stats["column_name"]] = {
+            "type": stats["column_type"],
+            "min": stats["min"],
+            "max": stats["max"],
+            "distinct": stats["approx_unique"],
+            "nulls": float(stats["null_percentage"] or 0),
+            "top": None,
+        }
+    text_columns = [c for c, p in profile.items() if p["type"] in ("VARCHAR", "BOOLEAN")]
+    if text_columns:
+        select = ", ".join(f"approx_top_k({quote_ident(c)}, {PROFILE_TOP_VALUES})" for c in text_columns)
+        tops = cursor.execute(f"SELECT {select} FROM {quote_ident(alias)}").fetchone()
+        for column, top in zip(text_columns, tops):
+            profile[column]["top"] = [str(v) for v in top if v is not None]
+    return profile
+
+
+def describe_column_stats(stats: dict) -> str:
+    text = f"{stats['nulls']:.1f}% null, ~{stats['distinct']:,} distinct"
+    if stats["top"]:
+        text += ", top: " + ", ".join(stats["top"])
+    elif stats["min"] is not None:
+        text += f", range {stats['min']} .. {stats['max']}"
+    return text
+
+
+
+def clean_sql_output(raw: str) -> str:
+    sql = raw.strip()
+    if sql.startswith("```"):
+        sql = sql.strip("`")
+        if sql.lower().startswith("sql"):
+            sql = sql[3:].strip()
+    return sql.strip("`").strip()
+
+
+class LLMCancelled(Exception):
+    pass
+
+
+def _stream_once(full_prompt, on_token, deadline, should_stop):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("LLM deadline exceeded")
+    stream = get_client().chat.completions.create(
+        model=LLM_MODEL,
+        messages=[{"role": "user", "content": full_prompt}],
+        temperature=0,
+        stream=True,
+        timeout=remaining,
+    )
+    text = ""
+    try:
+        for chunk in stream:
+            if should_stop is not None and should_stop():
+                raise LLMCancelled()
+            if time.monotonic() > deadline:
+                raise TimeoutError("LLM deadline exceeded")
+            if chunk.choices and chunk.choices[0].delta.content:
+                text += chunk.choices[0].delta.content
+                if on_token is not None:
+                    on_token(text)
+    finally:
+        stream.close()
+    return text
+
+
+# Timeouts, dropped connections, rate limits and server errors may pass on a
+# retry; anything else (no API key, a bad request, auth) fails the same way again.
+def is_transient_llm_error(ex) -> bool:
+    status = getattr(ex, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(ex, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(ex, openai.APIConnectionError)  # includes APITimeoutError
+
+
+# Streams one completion, retrying transient errors with exponential backoff
+# until the deadline.
+# on_token receives the text accumulated so far, so a retry simply restarts it.
+def stream_completion(full_prompt, on_token=None, timeout=LLM_TIMEOUT_S, should_stop=None):
+    deadline = time.monotonic() + timeout
+    last_error = TimeoutError("LLM deadline exceeded")
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        if attempt:
+            wake = time.monotonic() + LLM_BACKOFF_S * 2 ** (attempt - 1)
+            if wake >= deadline:
+                break
+            while time.monotonic() < wake:
+                if should_stop is not None and should_stop():
+                    raise LLMCancelled()
+                time.sleep(0.05)
+        try:
+            return _stream_once(full_prompt, on_token, deadline, should_stop)
+        except (LLMCancelled, TimeoutError):
+            raise
+        except Exception as ex:
+            if not is_transient_llm_error(ex):
+                raise
+            last_error = ex
+    raise last_error
+
+
+def generate_sql_from_prompt(prompt: str, digests: SchemaDigests, cache: SQLCache = None,
+                             on_token=None, timeout=LLM_TIMEOUT_S, should_stop=None,
+                             on_tables=None, on_prompt=None, timings=None) -> str:
+    span = timings.span if timings is not None else lambda phase: nullcontext()
+    with span("prompt"):
+        selection = digests.select(prompt)
+        cache_key = SQLCache.make_key(prompt, digests.fingerprint(selection), LLM_MODEL) if cache is not None else None
+    if on_tables is not None:
+        on_tables([alias for alias, _ in selection])
+    if cache is not None:
+        cached_sql = cache.get(cache_key)
+        if cached_sql is not None:
+            if on_token is not None:
+                on_token(cached_sql)
+            return cached_sql
+    with span("prompt"):
+        full_prompt = digests.build_prompt(prompt, selection)
+    if on_prompt is not None:
+        on_prompt(full_prompt)
+    try:
+        with span("llm"):
+            raw_sql = stream_completion(full_prompt, on_token, timeout, should_stop).strip()
+        sql = clean_sql_output(raw_sql)
+        if cache is not None:
+            cache.put(cache_key, sql)
+        return sql
+    except LLMCancelled:
+        raise
+    except Exception as ex:
+        return f"{LLM_ERROR_PREFIX}: {ex}"
+
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+
+
+# Registered aliases on one DuckDB connection plus the caches that depend on
+# them. Callers own threading; on_registered(alias) fires whenever an alias
+# enters the catalog so the GUI can queue profiling.
+class Engine:
+    def __init__(self, workspace_path=None, settings=None):
+        self._conn = None
+        self.settings = dict(settings or {})
+        self.workspace_path = None
+        self.tables = {}
+        self.default_kind = "table"
+        self.schema_digests = SchemaDigests()
+        self.sql_cache = SQLCache()
+        self.result_cache = ResultCache()
+        self.alias_versions = {}
+        self.on_registered = None
+        if workspace_path is not None:
+            self.open_workspace(workspace_path)
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            import duckdb
+            self._conn = duckdb.connect()
+            apply_duckdb_settings(self._conn, self.settings)
+        return self._conn
+
+    # Invalid values raise and leave the previous settings in effect.
+    def configure(self, settings):
+        settings = {name: settings.get(name) for name in DUCKDB_SETTING_NAMES}
+        try:
+            apply_duckdb_settings(self.conn, settings)
+        except Exception:
+            apply_duckdb_settings(self.conn, self.settings)
+            raise
+        self.settings = settings
+
+    # (bytes DuckDB holds, memory_limit as DuckDB prints it), or None before
+    # anything opened the connection.
+    def memory_usage(self):
+        if self._conn is None:
+            return None
+        limit = self._conn.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+        return duckdb_memory_bytes(self._conn), limit
+
+    def close(self):
+        self.result_cache.clear()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # --- Ingestion ---
+    def excel_sheet_names(self, file_path):
+        import pandas as pd
+        digest = file_digest(file_path)
+        xls = None
+        sheet_names = cached_sheet_names(digest)
+        if sheet_names is None:
+            xls = pd.ExcelFile(file_path)
+            sheet_names = xls.sheet_names
+            save_sheet_names(digest, sheet_names)
+        return sheet_names, xls
+
+    # The workbook is opened once and sheets missing from the Parquet cache are
+    # parsed from that handle; each parsed sheet is written to Parquet on a pool
+    # thread while the next one is being parsed.
+    def ingest_excel(self, file_path, pairs, xls=None, contexts=None):
+        import pandas as pd
+        digest = file_digest(file_path)
+        contexts = contexts or {}
+        with ThreadPoolExecutor(max_workers=min(EXCEL_PARALLEL_SHEETS, len(pairs))) as pool:
+            pending = []
+            for _, sheet in pairs:
+                cache_path = excel_cache_path(digest, sheet)
+                if os.path.exists(cache_path):
+                    continue
+                if xls is None:
+                    xls = pd.ExcelFile(file_path)
+                pending.append(pool.submit(write_parquet_cache, self.conn, xls.parse(sheet), cache_path))
+            for future in pending:
+                future.result()
+        # A view over the cache would go stale once the workbook changes, so
+        # workspaces always keep their own copy.
+        kind = "table" if self.workspace_path is not None else None
+        for alias, sheet in pairs:
+            scan = f"read_parquet({quote_literal(excel_cache_path(digest, sheet))})"
+            self.register_alias(alias, file_path, sheet, kind=kind,
+                                context=contexts.get(alias, ""), scan=scan)
+
+    # Registers a CSV, a glob of CSV/Parquet shards or workbook sheets (all
+    # sheets when none are named). Returns the aliases created.
+    def register_path(self, alias, path, sheets=None, with_filename=False):
+        if os.path.splitext(path)[1].lower() in EXCEL_EXTENSIONS:
+            sheet_names, xls = self.excel_sheet_names(path)
+            sheets = sheets or sheet_names
+            missing = [s for s in sheets if s not in sheet_names]
+            if missing:
+                raise ValueError(f"{os.path.basename(path)} has no sheet {missing[0]!r}")
+            if len(sheets) == 1:
+                pairs = [(alias, sheets[0])]
+            else:
+                pairs = [(sheet_alias(alias, sheet), sheet) for sheet in sheets]
+            self.ingest_excel(path, pairs, xls=xls)
+            return [a for a, _ in pairs]
+        if is_glob(path):
+            sql, kind, scan = self.glob_ingest(alias, path, with_filename)
+            self.conn.execute(sql)
+            self.adopt_glob(alias, path, kind, scan)
+            return [alias]
+        self.register_alias(alias, path)
+        return [alias]
+
+    # Glob ingestion builds the relation under a staging name and renames it
+    # over the alias afterwards, so a failed or cancelled scan leaves an
+    # existing alias untouched. The GUI runs the statement on a worker cursor.
+    def glob_ingest(self, alias, pattern, with_filename=False):
+        if not glob_files(pattern):
+            raise ValueError(f"No files match {pattern}")
+        kind = self.default_kind
+        scan = bulk_scan_expression(pattern, with_filename)
+        return relation_sql(staging_alias(alias), kind, scan), kind, scan
+
+    def adopt_glob(self, alias, pattern, kind, scan, rows=None):
+        self.release_alias(alias)
+        self.conn.execute(
+            f"ALTER {kind.upper()} {quote_ident(staging_alias(alias))} RENAME TO {quote_ident(alias)}"
+        )
+        self.record_alias(alias, pattern, "-", kind, scan=scan, rows=rows)
+
+    def discard_glob(self, alias, kind):
+        self.conn.execute(f"DROP {kind.upper()} IF EXISTS {quote_ident(staging_alias(alias))}")
+
+    def register_alias(self, alias, file_path, sheet="-", df=None, kind=None, context="", scan=None):
+        self.release_alias(alias)
+        if df is not None:
+            # DataFrames are copied into a native table and not kept, so DuckDB
+            # holds the only copy of the data.
+            kind = "table"
+            self.conn.register("__queryflex_ingest", df)
+            self.conn.execute(
+                f"CREATE OR REPLACE TABLE {quote_ident(alias)} AS SELECT * FROM __queryflex_ingest"
+            )
+            self.conn.unregister("__queryflex_ingest")
+        else:
+            kind = kind or self.default_kind
+            scan = scan or f"read_csv_auto({quote_literal(file_path)})"
+            self.conn.execute(relation_sql(alias, kind, scan))
+        self.record_alias(alias, file_path, sheet, kind, context, scan)
+
+    def record_alias(self, alias, file_path, sheet, kind, context="", scan=None, rows=None):
+        self.touch_alias(alias)
+        self.tables[alias] = self.build_table_meta(alias, kind, file_path, sheet, context, scan, rows)
+        if self.workspace_path is not None:
+            self.tables[alias].update(source_state(file_path, with_hash=kind == "table"))
+            self.save_table_meta(alias)
+        self.load_cached_profile(alias)
+        if self.on_registered is not None:
+            self.on_registered(alias)
+
+    def build_table_meta(self, alias, kind, file_path, sheet, context, scan=None, rows=None):
+        meta = {
+            "kind": kind,
+            "path": file_path,
+            "scan": scan,
+            "file": source_display_name(file_path),
+            "files": len(glob_files(file_path)) if is_glob(file_path) else 1,
+            "sheet": sheet,
+            "context": context,
+            "columns": describe_relation(self.conn, alias),
+            "rows": relation_row_count(self.conn, alias) if rows is None else rows,
+            "sample": self.conn.execute(f"SELECT * FROM {quote_ident(alias)} LIMIT 3").df(),
+        }
+        meta["values"] = sample_distinct_values(self.conn, alias, meta["columns"])
+        if kind == "table":
+            try:
+                self.conn.execute("CHECKPOINT")
+            except Exception:
+                pass  # another write is in flight; the estimate counts raw segments
+        meta["storage_bytes"] = table_storage_bytes(self.conn, alias) if kind == "table" else None
+        return meta
+
+    # --- Catalog edits ---
+    def touch_alias(self, alias):
+        self.alias_versions[alias] = self.alias_versions.get(alias, 0) + 1
+        self.result_cache.invalidate(alias)
+
+    # DuckDB identifiers ignore case, so "Sales" and "sales" are one relation.
+    def find_alias(self, name):
+        lowered = name.lower()
+        return next((a for a in self.tables if a.lower() == lowered), None)
+
+    # Registering a name again replaces whichever alias holds it, in any case.
+    def release_alias(self, alias):
+        existing = self.find_alias(alias)
+        if existing is not None:
+            self.remove_alias(existing)
+
+    def drop_relation(self, alias):
+        kind = self.tables[alias]["kind"]
+        self.conn.execute(f"DROP {kind.upper()} IF EXISTS {quote_ident(alias)}")
+
+    def rename_alias(self, alias, new_alias):
+        existing = self.find_alias(new_alias)
+        if existing is not None and existing != alias:
+            raise ValueError(f"An alias named {existing} already exists")
+        meta = self.tables[alias]
+        self.conn.execute(
+            f"ALTER {meta['kind'].upper()} {quote_ident(alias)} RENAME TO {quote_ident(new_alias)}"
+        )
+        self.tables.pop(alias)
+        self.tables[new_alias] = meta
+        self.touch_alias(alias)
+        self.touch_alias(new_alias)
+        self.schema_digests.discard(alias)
+        self.schema_digests.update(new_alias, meta)
+        if self.workspace_path is not None:
+            self.delete_table_meta(alias)
+            self.save_table_meta(new_alias)
+
+    def remove_alias(self, alias):
+        self.drop_relation(alias)
+        self.tables.pop(alias)
+        self.schema_digests.discard(alias)
+        self.touch_alias(alias)
+        if self.workspace_path is not None:
+            self.delete_table_meta(alias)
+
+    def set_context(self, alias, context):
+        meta = self.tables[alias]
+        if meta["context"] == context:
+            return False
+        meta["context"] = context
+        self.schema_digests.update(alias, meta)
+        if self.workspace_path is not None:
+            self.conn.execute(
+                f"UPDATE {WORKSPACE_META_TABLE} SET context = ? WHERE alias = ?", [context, alias]
+            )
+        return True
+
+    # --- Profiles ---
+    def load_cached_profile(self, alias):
+        meta = self.tables[alias]
+        meta["profile_key"] = profile_cache_key(meta)
+        meta["profile"] = load_profile(meta["profile_key"])
+        self.schema_digests.update(alias, meta)
+        return meta["profile"] is not None
+
+    def set_profile(self, meta, profile):
+        alias = next((a for a, m in self.tables.items() if m is meta), None)
+        if alias is None:
+            return None
+        meta["profile"] = profile
+        save_profile(meta["profile_key"], profile)
+        self.schema_digests.update(alias, meta)
+        return alias
+
+    def profile_alias(self, alias):
+        if self.tables[alias]["profile"] is None:
+            cursor = open_cursor(self.conn)
+            try:
+                self.set_profile(self.tables[alias], profile_relation(cursor, alias))
+            finally:
+                cursor.close()
+        return self.tables[alias]["profile"]
+
+    # --- Workspace ---
+    # Returns the aliases that had to be re-ingested because their source changed.
+    # Returns (re-ingested aliases, {alias: error}). A stale source that can
+    # no longer be read keeps the stored table and is retried on the next
+    # open; an alias that cannot be restored at all is left out.
+    def open_workspace(self, path):
+        import duckdb
+        conn = duckdb.connect(path)
+        try:
+            apply_duckdb_settings(conn, self.settings)
+        except Exception:
+            conn.close()
+            raise
+        self.result_cache.clear()
+        if self._conn is not None:
+            self._conn.close()
+        self.tables = {}
+        self.schema_digests.clear()
+        self._conn = conn
+        self.workspace_path = path
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {WORKSPACE_META_TABLE} ("
+            "alias VARCHAR PRIMARY KEY, kind VARCHAR, path VARCHAR, sheet VARCHAR, "
+            "context VARCHAR, size BIGINT, mtime DOUBLE, hash VARCHAR, scan VARCHAR)"
+        )
+        self.conn.execute(f"ALTER TABLE {WORKSPACE_META_TABLE} ADD COLUMN IF NOT EXISTS scan VARCHAR")
+        stored = self.conn.execute(
+            f"SELECT alias, kind, path, sheet, context, size, mtime, hash, scan "
+            f"FROM {WORKSPACE_META_TABLE} ORDER BY rowid"
+        ).fetchall()
+        reingested, failed = [], {}
+        for alias, kind, src, sheet, context, size, mtime, digest, scan in stored:
+            stale = False
+            # Views read the file on every query, so they never go stale.
+            if kind == "table" and source_changed(src, size, mtime, digest):
+                try:
+                    self.reingest(alias, src, sheet, context, scan)
+                    reingested.append(alias)
+                    continue
+                except Exception as ex:
+                    failed[alias] = f"kept the stored copy: {str(ex).splitlines()[0]}"
+                    stale = True
+            try:
+                self.tables[alias] = self.build_table_meta(alias, kind, src, sheet, context, scan)
+            except Exception as ex:
+                failed[alias] = str(ex).splitlines()[0]
+                continue
+            self.tables[alias].update({"size": size, "mtime": mtime, "hash": digest})
+            if not stale and not is_glob(src) and os.path.exists(src) and os.stat(src).st_mtime != mtime:
+                # Touched but identical content: remember the new mtime.
+                self.tables[alias]["mtime"] = os.stat(src).st_mtime
+                self.save_table_meta(alias)
+            self.load_cached_profile(alias)
+            if self.on_registered is not None:
+                self.on_registered(alias)
+        return reingested, failed
+
+    def reingest(self, alias, file_path, sheet, context, scan=None):
+        if os.path.splitext(file_path)[1].lower() in EXCEL_EXTENSIONS:
+            self.ingest_excel(file_path, [(alias, sheet)], contexts={alias: context})
+        else:
+            self.register_alias(alias, file_path, sheet, kind="table", context=context, scan=scan)
+
+    def save_table_meta(self, alias):
+        meta = self.tables[alias]
+        self.delete_table_meta(alias)
+        self.conn.execute(
+            f"INSERT INTO {WORKSPACE_META_TABLE} "
+            "(alias, kind, path, sheet, context, size, mtime, hash, scan) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [alias, meta["kind"], meta["path"], meta["sheet"], meta["context"],
+             meta["size"], meta["mtime"], meta["hash"], meta["scan"]],
+        )
+
+    def delete_table_meta(self, alias):
+        self.conn.execute(f"DELETE FROM {WORKSPACE_META_TABLE} WHERE alias = ?", [alias])
+
+    # --- Queries ---
+    # Returns (cache key or None when the SQL must not be cached, aliases, cached result).
+    def lookup_result(self, sql):
+        if not self.result_cache.budget or not is_read_only_sql(sql) or VOLATILE_SQL.search(sql):
+            return None, set(), None
+        aliases = referenced_aliases(sql, self.tables)
+        if any(self.tables[a]["kind"] == "view" for a in aliases):
+            # Views read their files on every query, so their results never
+            # match an alias version.
+            return None, aliases, None
+        key = ResultCache.make_key(sql, {a: self.alias_versions.get(a, 0) for a in aliases})
+        return key, aliases, self.result_cache.get(key)
+
+    def store_result(self, key, aliases, result):
+        if key is not None:
+            if result.is_complete():
+                self.result_cache.put(key, result, aliases)
+        elif not is_read_only_sql(result.sql):
+            # DDL/DML may have changed any table behind the cache's back.
+            self.result_cache.clear()
+
+    def generate_sql(self, prompt, **kwargs):
+        return generate_sql_from_prompt(prompt, self.schema_digests, self.sql_cache, **kwargs)
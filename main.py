@@ -1,80 +1,546 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import sys
 import os
-import duckdb
-import pandas as pd
-import matplotlib
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import matplotlib.pyplot as plt
-import mplcursors
+import json
+import re
+import subprocess
+from contextlib import nullcontext
 
+# duckdb, pandas, matplotlib and openai are imported where they are first
+# needed so the window can paint before any of them load.
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
     QTableWidgetItem, QPushButton, QTextEdit, QFileDialog, QLabel,
     QSplitter, QMessageBox, QInputDialog, QHeaderView, QCheckBox,
-    QComboBox, QTabWidget, QScrollArea
+    QComboBox, QTabWidget, QScrollArea, QTableView, QAbstractItemView, QProgressBar,
+    QSpinBox, QDialog, QDialogButtonBox, QListWidget, QLineEdit, QProgressDialog, QStatusBar
+)
+from PyQt5.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QThread, QTimer, QElapsedTimer, pyqtSignal
 )
-from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPalette, QColor, QFont, QIcon
 
-from openai import OpenAI
-from dotenv import load_dotenv
-load_dotenv()
-
-matplotlib.use("Qt5Agg")
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ["OPENAI_BASE_URL"])
-
-
-def clean_sql_output(raw: str) -> str:
-    sql = raw.strip()
-    if sql.startswith("```"):
-        sql = sql.strip("`")
-        if sql.lower().startswith("sql"):
-            sql = sql[3:].strip()
-    return sql.strip("`").strip()
-
-
-def generate_sql_from_prompt(prompt: str, schema_tables: dict) -> str:
-    schema_desc, samples_desc, context_desc = [], [], []
-    for alias, meta in schema_tables.items():
-        df = meta["df"]
-        cols = ", ".join([f"{c} ({df[c].dtype})" for c in df.columns])
-        schema_desc.append(f"Table {alias}: {cols}")
-        sample_df = df.head(3)
-        samples_desc.append(f"Samples from {alias}:\n{sample_df.to_csv(index=False)}")
-        if meta.get("context"):
-            context_desc.append(f"Context for {alias}: {meta['context']}")
-    schema_text = "\n".join(schema_desc)
-    samples_text = "\n".join(samples_desc)
-    context_text = "\n".join(context_desc)
-    full_prompt = f"""
-You are a SQL assistant. Convert the natural language question into a valid DuckDB SQL query.
-
-Schema:
-{schema_text}
-
-Sample data:
-{samples_text}
-
-Additional context:
-{context_text}
-
-Question: {prompt}
-
-Rules:
-- Only use the provided tables/columns.
-- Qualify ambiguous column names with table alias if needed.
-- Return ONLY the SQL query (no explanations, no markdown, no ``` fences).
-"""
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": full_prompt}],
-            temperature=0,
+from engine import (
+    DEFAULT_MEMORY_CAP_MB, DEFAULT_PAGE_SIZE, DEFAULT_RESULT_CACHE_MB, EXPORT_FILTERS,
+    LLM_ERROR_PREFIX, LLM_TIMEOUT_S, Engine, LLMCancelled, QueryResult, RunTimings,
+    append_timing_log, arrow_reader, load_duckdb_settings, save_duckdb_settings,
+    copy_statement, count_tokens, describe_column_stats, generate_sql_from_prompt, get_client,
+    glob_files, open_cursor, profile_relation, quote_ident, relation_row_count,
+    sheet_alias, staging_alias, write_xlsx_streaming,
+)
+from service import RemoteQueryResult, remote_generate_sql, remote_tables
+
+MODULES_LOADED_T = time.perf_counter()
+HEAVY_MODULES = ["duckdb", "pandas", "pyarrow", "matplotlib", "mplcursors", "openai"]
+
+INGEST_MODES = {
+    "Native table": "table",
+    "View over file": "view",
+}
+
+
+# --- Chart data ---
+# Charts never pull raw rows into matplotlib: bars are grouped or binned in
+# DuckDB and lines are reduced to roughly one point per horizontal pixel.
+MAX_BARS = 200
+MAX_FIGURE_WIDTH_IN = 40
+LINE_M4_THRESHOLD = 200_000
+AGGREGATES = {"Sum": "SUM", "Average": "AVG", "Count": "COUNT", "Min": "MIN", "Max": "MAX"}
+NUMERIC_TYPE_PREFIXES = (
+    "TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+    "UINTEGER", "UBIGINT", "UHUGEINT", "FLOAT", "DOUBLE", "DECIMAL", "REAL",
+)
+
+
+def column_kind(cursor, sql: str, column: str) -> str:
+    dtype = cursor.execute(f"DESCRIBE SELECT {quote_ident(column)} FROM (\n{sql}\n)").fetchone()[1]
+    if dtype.startswith(("DATE", "TIMESTAMP")):
+        return "temporal"
+    if dtype.startswith(NUMERIC_TYPE_PREFIXES):
+        return "numeric"
+    return "category"
+
+
+def axis_key(column: str, kind: str) -> str:
+    # Numeric key used for binning: microseconds for time, the value otherwise.
+    if kind == "temporal":
+        return f"epoch_us(CAST({quote_ident(column)} AS TIMESTAMP))"
+    return f"CAST({quote_ident(column)} AS DOUBLE)"
+
+
+def key_to_axis(values, kind):
+    import numpy as np
+    if kind == "temporal":
+        return np.asarray(values, dtype="int64").astype("datetime64[us]")
+    return np.asarray(values, dtype="float64")
+
+
+def filtered_source(sql: str, x: str, bounds=None):
+    where = f"{quote_ident(x)} IS NOT NULL"
+    params = []
+    if bounds is not None:
+        where += f" AND {quote_ident(x)} BETWEEN ? AND ?"
+        params = list(bounds)
+    return f"(SELECT * FROM (\n{sql}\n) WHERE {where})", params
+
+
+# Returns (x values, y values, bar width or None, distinct x count).
+def aggregate_bars(cursor, sql, x, y, agg, kind, bounds=None, max_bars=MAX_BARS):
+    src, params = filtered_source(sql, x, bounds)
+    qx, qy = quote_ident(x), quote_ident(y)
+    distinct = cursor.execute(f"SELECT COUNT(DISTINCT {qx}) FROM {src}", params).fetchone()[0]
+    if kind == "category" or distinct <= max_bars:
+        # Too many categories: keep the largest bars rather than an unreadable axis.
+        order = "2 DESC" if distinct > max_bars else "1"
+        df = cursor.execute(
+            f"SELECT {qx} AS x, {agg}({qy}) AS y FROM {src} GROUP BY 1 ORDER BY {order} LIMIT {max_bars}",
+            params,
+        ).df()
+        return df["x"], df["y"], None, distinct
+    key = axis_key(x, kind)
+    lo, hi = cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {src}", params).fetchone()
+    width = (hi - lo) / max_bars or 1
+    rows = cursor.execute(
+        f"SELECT LEAST(FLOOR(({key} - ?) / ?), {max_bars - 1}) AS b, {agg}({qy}) AS y "
+        f"FROM {src} GROUP BY 1 ORDER BY 1",
+        [lo, width] + params,
+    ).fetchall()
+    centers = [lo + (b + 0.5) * width for b, _ in rows]
+    bar_width = width / 86_400_000_000 if kind == "temporal" else width  # matplotlib dates are days
+    return key_to_axis(centers, kind), [v for _, v in rows], bar_width * 0.9, distinct
+
+
+# Scatter plots above this many points are drawn as a 2-D histogram image.
+DEFAULT_DENSITY_THRESHOLD = 100_000
+DENSITY_BINS = 256
+
+
+def plot_units(keys, kind):
+    if kind == "temporal":
+        from matplotlib.dates import date2num
+        return date2num(key_to_axis(keys, kind))
+    return key_to_axis(keys, kind)
+
+
+# Returns (counts[y_bin, x_bin], (x0, x1, y0, y1) in key units, point count).
+def density_grid(cursor, sql, x, y, kinds, bins=DENSITY_BINS, bounds=None):
+    import numpy as np
+    qx, qy = quote_ident(x), quote_ident(y)
+    where = f"{qx} IS NOT NULL AND {qy} IS NOT NULL"
+    params = []
+    if bounds is not None:
+        where += f" AND {qx} BETWEEN ? AND ? AND {qy} BETWEEN ? AND ?"
+        params = [*bounds[0], *bounds[1]]
+    src = f"(SELECT {axis_key(x, kinds[0])} AS kx, {axis_key(y, kinds[1])} AS ky FROM (\n{sql}\n) WHERE {where})"
+    total, x0, x1, y0, y1 = cursor.execute(
+        f"SELECT COUNT(*), MIN(kx), MAX(kx), MIN(ky), MAX(ky) FROM {src}", params
+    ).fetchone()
+    grid = np.zeros((bins, bins), dtype="int64")
+    if not total:
+        return grid, None, 0
+    wx, wy = (x1 - x0) / bins or 1, (y1 - y0) / bins or 1
+    cells = cursor.execute(
+        f"SELECT LEAST(FLOOR((kx - ?) / ?), {bins - 1}) AS bx, LEAST(FLOOR((ky - ?) / ?), {bins - 1}) AS by, "
+        f"COUNT(*) AS n FROM {src} GROUP BY 1, 2",
+        [x0, wx, y0, wy] + params,
+    ).fetchnumpy()
+    grid[cells["by"].astype("int64"), cells["bx"].astype("int64")] = cells["n"]
+    return grid, (x0, x0 + wx * bins, y0, y0 + wy * bins), total
+
+
+def lttb(x, y, n_out):
+    import numpy as np
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    every = (n - 2) / (n_out - 2)
+    picked = [0]
+    a = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = min(int((i + 1) * every) + 1, n)
+        next_end = min(int((i + 2) * every) + 1, n)
+        if end < next_end:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        picked.append(a)
+    picked.append(n - 1)
+    return x[picked], y[picked]
+
+
+# Returns (x values, y values, source row count) ready for ax.plot.
+def line_points(cursor, sql, x, y, kind, n_out, bounds=None):
+    import numpy as np
+    src, params = filtered_source(sql, x, bounds)
+    key, qy = axis_key(x, kind), f"CAST({quote_ident(y)} AS DOUBLE)"
+    src = f"(SELECT {key} AS k, {qy} AS v FROM {src} WHERE {quote_ident(y)} IS NOT NULL)"
+    count, lo, hi = cursor.execute(f"SELECT COUNT(*), MIN(k), MAX(k) FROM {src}", params).fetchone()
+    if count > LINE_M4_THRESHOLD:
+        # M4 pre-reduction: per bucket keep first, last, min and max points,
+        # which preserves every visible extreme before LTTB runs locally.
+        buckets = n_out * 4
+        width = (hi - lo) / buckets or 1
+        rows = cursor.execute(
+            f"SELECT MIN(k), ARG_MIN(v, k), MAX(k), ARG_MAX(v, k), "
+            f"ARG_MIN(k, v), MIN(v), ARG_MAX(k, v), MAX(v) "
+            f"FROM (SELECT *, LEAST(FLOOR((k - ?) / ?), {buckets - 1}) AS b FROM {src}) GROUP BY b",
+            [lo, width] + params,
+        ).fetchall()
+        points = sorted({(row[i], row[i + 1]) for row in rows for i in range(0, 8, 2)})
+        xs = np.array([p[0] for p in points], dtype="float64")
+        ys = np.array([p[1] for p in points], dtype="float64")
+    else:
+        arr = cursor.execute(f"SELECT k, v FROM {src} ORDER BY k", params).fetchnumpy()
+        xs, ys = arr["k"].astype("float64"), arr["v"].astype("float64")
+    xs, ys = lttb(xs, ys, n_out)
+    return key_to_axis(xs, kind), ys, count
+
+
+class SheetPickerDialog(QDialog):
+    def __init__(self, file_name, sheet_names, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Select Sheets")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(
+            f"Sheets in {file_name}\n(select several to load each as its own alias)"
+        ))
+        self.sheet_list = QListWidget()
+        self.sheet_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.sheet_list.addItems(sheet_names)
+        self.sheet_list.setCurrentRow(0)
+        layout.addWidget(self.sheet_list)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def selected_sheets(self):
+        return [item.text() for item in self.sheet_list.selectedItems()]
+
+
+class BulkIngestDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Folder / Glob")
+        self.resize(520, 0)
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel("Files (glob, e.g. C:/drops/2024-*/*.csv or /data/**/*.parquet)"))
+        pattern_layout = QHBoxLayout()
+        self.pattern_edit = QLineEdit()
+        browse_btn = QPushButton("Browse…")
+        browse_btn.clicked.connect(self.browse)
+        pattern_layout.addWidget(self.pattern_edit)
+        pattern_layout.addWidget(browse_btn)
+        layout.addLayout(pattern_layout)
+
+        layout.addWidget(QLabel("Alias"))
+        self.alias_edit = QLineEdit()
+        layout.addWidget(self.alias_edit)
+
+        self.filename_checkbox = QCheckBox("Add a filename column")
+        layout.addWidget(self.filename_checkbox)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def browse(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if folder:
+            self.pattern_edit.setText(os.path.join(folder, "*.csv"))
+
+    def values(self):
+        return (
+            os.path.abspath(self.pattern_edit.text().strip()),
+            self.alias_edit.text().strip(),
+            self.filename_checkbox.isChecked(),
         )
-        raw_sql = resp.choices[0].message.content.strip()
-        return clean_sql_output(raw_sql)
-    except Exception as ex:
-        return f"-- Error generating SQL: {ex}"
+
+
+class DuckDBSettingsDialog(QDialog):
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("DuckDB Settings")
+        self.resize(480, 0)
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel("Memory limit (e.g. 4GB; empty = 80% of RAM)"))
+        self.memory_edit = QLineEdit(settings.get("memory_limit") or "")
+        layout.addWidget(self.memory_edit)
+
+        layout.addWidget(QLabel("Threads (0 = one per core)"))
+        self.threads_spin = QSpinBox()
+        self.threads_spin.setRange(0, 256)
+        self.threads_spin.setValue(int(settings.get("threads") or 0))
+        layout.addWidget(self.threads_spin)
+
+        layout.addWidget(QLabel("Spill directory for queries larger than the memory limit"))
+        temp_layout = QHBoxLayout()
+        self.temp_edit = QLineEdit(settings.get("temp_directory") or "")
+        self.temp_edit.setPlaceholderText("empty = only next to a workspace file")
+        browse_btn = QPushButton("Browse…")
+        browse_btn.clicked.connect(self.browse)
+        temp_layout.addWidget(self.temp_edit)
+        temp_layout.addWidget(browse_btn)
+        layout.addLayout(temp_layout)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def browse(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Spill Directory")
+        if folder:
+            self.temp_edit.setText(folder)
+
+    def values(self):
+        return {
+            "memory_limit": self.memory_edit.text().strip() or None,
+            "threads": self.threads_spin.value() or None,
+            "temp_directory": self.temp_edit.text().strip() or None,
+        }
+
+
+# Runs one long statement (bulk ingestion, COPY export) on its own cursor so
+# it can report progress and be cancelled without blocking the GUI thread.
+# `after` runs on the same cursor once the statement succeeds.
+class StatementWorker(QThread):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, conn, sql, after=None, output_path=None, parent=None):
+        super().__init__(parent)
+        self.sql = sql
+        self.after = after
+        self.output_path = output_path
+        self.cancelled = False
+        self.cursor = open_cursor(conn)
+        self.cursor.execute("SET enable_progress_bar = true")
+        self.cursor.execute("SET enable_progress_bar_print = false")
+
+    def run(self):
+        try:
+            self.cursor.execute(self.sql)
+            outcome = self.after(self.cursor) if self.after is not None else None
+        except Exception as ex:
+            self.failed.emit(str(ex))
+        else:
+            self.done.emit(outcome)
+        finally:
+            self.cursor.close()
+
+    def progress(self):
+        # -1 while DuckDB cannot estimate yet (e.g. sniffing schemas across files).
+        return self.cursor.query_progress() if not self.isFinished() else 100.0
+
+    def detail(self):
+        if self.output_path is None or not os.path.exists(self.output_path):
+            return None
+        return f"{os.path.getsize(self.output_path) / 2**20:,.1f} MB written"
+
+    def cancel(self):
+        if self.isRunning():
+            self.cancelled = True
+            self.cursor.interrupt()
+
+
+# Profiles one alias with SUMMARIZE on its own cursor. Runs alongside user
+# queries and is never counted by is_busy().
+class ProfileWorker(QThread):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, conn, alias, meta, parent=None):
+        super().__init__(parent)
+        self.alias = alias
+        self.meta = meta
+        self.cursor = open_cursor(conn)
+
+    def run(self):
+        try:
+            profile = profile_relation(self.cursor, self.alias)
+        except Exception as ex:
+            self.failed.emit(str(ex))
+        else:
+            self.done.emit(profile)
+        finally:
+            self.cursor.close()
+
+    def cancel(self):
+        if self.isRunning():
+            self.cursor.interrupt()
+
+
+# Streams a query into an .xlsx file through xlsxwriter's constant-memory
+# mode, one record batch at a time.
+class XlsxExportWorker(QThread):
+    done = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, conn, sql, path, batch_size=DEFAULT_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.sql = sql
+        self.path = path
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.cancelled = False
+        self.cursor = open_cursor(conn)
+
+    def run(self):
+        try:
+            reader = arrow_reader(self.cursor, self.sql, self.batch_size)
+            sheets = write_xlsx_streaming(
+                reader, self.path, on_progress=self.set_rows_written,
+                should_stop=lambda: self.cancelled,
+            )
+        except Exception as ex:
+            self.failed.emit(str(ex))
+        else:
+            self.done.emit(sheets)
+        finally:
+            self.cursor.close()
+
+    def set_rows_written(self, rows):
+        self.rows_written = rows
+
+    def progress(self):
+        return -1
+
+    def detail(self):
+        return f"{self.rows_written:,} rows written"
+
+    def cancel(self):
+        if self.isRunning():
+            self.cancelled = True
+            self.cursor.interrupt()
+
+
+# Read-only model over the result columns; cells are formatted only when painted.
+class ResultTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._result = None
+        self._headers = []
+        self._row_count = 0
+
+    def set_result(self, result):
+        self.beginResetModel()
+        self._result = result
+        self._headers = [str(c) for c in result.columns]
+        self._row_count = result.row_count
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._result = None
+        self._headers = []
+        self._row_count = 0
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._result is not None and self._result.has_more()
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        added = self._result.fetch_page()
+        if added:
+            self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + added - 1)
+            self._row_count += added
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return str(self._result.cell(index.row(), index.column()))
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+
+# Generates SQL off the GUI thread, streaming partial text through `token`.
+class LLMWorker(QThread):
+    token = pyqtSignal(str)
+    sql_ready = pyqtSignal(str)
+
+    def __init__(self, prompt, digests, cache, timeout, remote_url=None, timings=None, parent=None):
+        super().__init__(parent)
+        self.prompt = prompt
+        self.remote_url = remote_url
+        self.timings = timings
+        self.digests = digests.snapshot()
+        self.included = []
+        self.prompt_tokens = None
+        self.cache = cache
+        self.timeout = timeout
+        self.cancelled = False
+        self.failed = False
+
+    def run(self):
+        if self.remote_url is not None:
+            with self.timings.span("llm") if self.timings is not None else nullcontext():
+                sql, self.included = remote_generate_sql(self.remote_url, self.prompt, self.timeout)
+            if not self.cancelled:
+                self.sql_ready.emit(sql)
+            return
+        try:
+            sql = generate_sql_from_prompt(
+                self.prompt, self.digests, self.cache,
+                on_token=self.token.emit, timeout=self.timeout,
+                should_stop=lambda: self.cancelled,
+                on_tables=lambda aliases: setattr(self, "included", aliases),
+                on_prompt=lambda text: setattr(self, "prompt_tokens", count_tokens(text)),
+                timings=self.timings,
+            )
+        except LLMCancelled:
+            return
+        self.sql_ready.emit(sql)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# Runs one statement on its own DuckDB cursor so the GUI thread never blocks.
+# Only the first page is fetched here; the grid pulls the rest on demand.
+class QueryWorker(QThread):
+    result_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, result, parent=None):
+        super().__init__(parent)
+        self.result = result
+        self.cancelled = False
+
+    def run(self):
+        try:
+            self.result.execute()
+        except Exception as ex:
+            self.result.close()
+            self.failed.emit(str(ex))
+        else:
+            self.result_ready.emit(self.result)
+
+    def cancel(self):
+        self.cancelled = True
+        self.result.interrupt()
 
 
 class SQLExplorer(QWidget):
@@ -83,12 +549,25 @@ class SQLExplorer(QWidget):
         self.setWindowTitle("Query Gen 2.0")
         self.resize(1600, 900)
 
-        self.conn = duckdb.connect()
-        self.tables = {}
-        self.current_result_df = None
+        self.engine = Engine(settings=load_duckdb_settings())
+        self.engine.on_registered = self.queue_profile
+        self.first_paint_callback = None
+        self.current_result = None
+        self.query_worker = None
+        self.llm_worker = None
+        self.job_worker = None
+        self.pending_sql = None
+        self.profile_queue = []
+        self.profile_worker = None
+        self.current_from_cache = False
+        self.remote_url = None
+        self.remote_catalog = {}
+        self.run_timings = None
+        self.last_timings = None
+        self.last_prompt_tokens = None
         self.dark_mode = True
 
-        main_layout = QHBoxLayout(self)
+        main_layout = QVBoxLayout(self)
 
         # Sidebar
         sidebar_layout = QVBoxLayout()
@@ -96,8 +575,47 @@ class SQLExplorer(QWidget):
         self.add_file_btn.clicked.connect(self.add_file)
         sidebar_layout.addWidget(self.add_file_btn)
 
-        self.table_list = QTableWidget(0, 6)
-        self.table_list.setHorizontalHeaderLabels(["Alias", "File", "Sheet", "Rows", "Edit", "Remove"])
+        self.add_folder_btn = QPushButton("📁 Add Folder / Glob")
+        self.add_folder_btn.setToolTip("Register every matching file as one alias")
+        self.add_folder_btn.clicked.connect(self.add_folder)
+        sidebar_layout.addWidget(self.add_folder_btn)
+
+        workspace_layout = QHBoxLayout()
+        self.workspace_btn = QPushButton("💾 Open Workspace")
+        self.workspace_btn.setToolTip("Open or create a .duckdb workspace that keeps tables across launches")
+        self.workspace_btn.clicked.connect(self.open_workspace)
+        self.workspace_label = QLabel("Workspace: in-memory")
+        workspace_layout.addWidget(self.workspace_btn)
+        workspace_layout.addWidget(self.workspace_label)
+        sidebar_layout.addLayout(workspace_layout)
+
+        self.server_btn = QPushButton("🌐 Connect to Server…")
+        self.server_btn.setToolTip("Query tables served by service.py instead of loading files here")
+        self.server_btn.clicked.connect(self.connect_server)
+        sidebar_layout.addWidget(self.server_btn)
+
+        ingest_layout = QHBoxLayout()
+        ingest_layout.addWidget(QLabel("Ingestion"))
+        self.ingest_mode = QComboBox()
+        self.ingest_mode.addItems(list(INGEST_MODES))
+        self.ingest_mode.setToolTip(
+            "Native table: load once with DuckDB's parallel reader.\n"
+            "View over file: scan the CSV (or cached Excel sheet) on every query."
+        )
+        self.ingest_mode.currentTextChanged.connect(
+            lambda label: setattr(self.engine, "default_kind", INGEST_MODES[label])
+        )
+        ingest_layout.addWidget(self.ingest_mode)
+        self.settings_btn = QPushButton("⚙ DuckDB")
+        self.settings_btn.setToolTip("Memory limit, threads and spill directory")
+        self.settings_btn.clicked.connect(self.edit_duckdb_settings)
+        ingest_layout.addWidget(self.settings_btn)
+        sidebar_layout.addLayout(ingest_layout)
+
+        self.table_list = QTableWidget(0, 8)
+        self.table_list.setHorizontalHeaderLabels(
+            ["Alias", "File", "Sheet", "Files", "Rows", "Memory", "Edit", "Remove"]
+        )
         self.table_list.horizontalHeader().setStretchLastSection(True)
         self.table_list.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table_list.cellClicked.connect(self.on_table_clicked)  # keep schema in sync
@@ -118,7 +636,14 @@ class SQLExplorer(QWidget):
 
         self.context_editor = QTextEdit()
         self.context_editor.setFont(QFont("Segoe UI", 10))
-        self.context_editor.textChanged.connect(self.save_context)
+        self.context_editor.textChanged.connect(self.on_context_edited)
+        # Contexts feed the prompt digests (and the workspace), so typing is
+        # saved once it pauses rather than on every keystroke.
+        self.context_alias = None
+        self.context_timer = QTimer(self)
+        self.context_timer.setSingleShot(True)
+        self.context_timer.setInterval(500)
+        self.context_timer.timeout.connect(self.save_context)
         sidebar_layout.addWidget(self.context_editor)
 
         # Right side
@@ -136,8 +661,28 @@ class SQLExplorer(QWidget):
         self.sql_editor.setFont(QFont("Consolas", 13))
         editor_layout.addWidget(self.sql_editor)
 
+        llm_layout = QHBoxLayout()
         self.use_llm_checkbox = QCheckBox("Use Natural Language (LLM)")
-        editor_layout.addWidget(self.use_llm_checkbox)
+        self.use_llm_checkbox.toggled.connect(self.on_llm_toggled)
+        llm_layout.addWidget(self.use_llm_checkbox)
+        llm_layout.addStretch()
+        llm_layout.addWidget(QLabel("LLM timeout"))
+        self.llm_timeout_spin = QSpinBox()
+        self.llm_timeout_spin.setRange(5, 600)
+        self.llm_timeout_spin.setSuffix(" s")
+        self.llm_timeout_spin.setValue(LLM_TIMEOUT_S)
+        llm_layout.addWidget(self.llm_timeout_spin)
+        self.cache_status = QLabel()
+        llm_layout.addWidget(self.cache_status)
+        editor_layout.addLayout(llm_layout)
+        self.update_cache_status()
+
+        self.llm_preview = QTextEdit()
+        self.llm_preview.setReadOnly(True)
+        self.llm_preview.setFont(QFont("Consolas", 11))
+        self.llm_preview.setPlaceholderText("Generated SQL appears here")
+        self.llm_preview.setMaximumHeight(120)
+        editor_layout.addWidget(self.llm_preview)
 
         btn_layout = QHBoxLayout()
         self.preview_btn = QPushButton("👁 Preview Query")
@@ -148,9 +693,28 @@ class SQLExplorer(QWidget):
         self.clear_btn.clicked.connect(lambda: self.sql_editor.clear())
         btn_layout.addWidget(self.preview_btn)
         btn_layout.addWidget(self.run_btn)
+        self.cancel_btn = QPushButton("■ Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_query)
         btn_layout.addWidget(self.clear_btn)
+        btn_layout.addWidget(self.cancel_btn)
         editor_layout.addLayout(btn_layout)
 
+        status_layout = QHBoxLayout()
+        self.query_progress = QProgressBar()
+        self.query_progress.setRange(0, 1)
+        self.query_progress.setTextVisible(False)
+        self.query_progress.setMaximumHeight(10)
+        self.query_status = QLabel("Ready")
+        status_layout.addWidget(self.query_progress)
+        status_layout.addWidget(self.query_status)
+        editor_layout.addLayout(status_layout)
+
+        self.query_clock = QElapsedTimer()
+        self.elapsed_timer = QTimer(self)
+        self.elapsed_timer.setInterval(100)
+        self.elapsed_timer.timeout.connect(self.update_elapsed)
+
         right_splitter.addWidget(editor_widget)
 
         # Results
@@ -159,9 +723,11 @@ class SQLExplorer(QWidget):
         self.tabs = QTabWidget()
 
         # Table tab
-        self.result_table = QTableWidget(0, 0)
-        self.result_table.setHorizontalScrollMode(QTableWidget.ScrollPerPixel)
-        self.result_table.setVerticalScrollMode(QTableWidget.ScrollPerPixel)
+        self.result_model = ResultTableModel(self)
+        self.result_table = QTableView()
+        self.result_table.setModel(self.result_model)
+        self.result_table.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.result_table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.result_table.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.result_table.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.result_table.setWordWrap(False)
@@ -172,8 +738,35 @@ class SQLExplorer(QWidget):
         table_layout = QVBoxLayout(table_tab)
         table_layout.addWidget(self.result_table)
 
+        paging_layout = QHBoxLayout()
+        self.page_size_spin = QSpinBox()
+        self.page_size_spin.setRange(1_000, 1_000_000)
+        self.page_size_spin.setSingleStep(1_000)
+        self.page_size_spin.setValue(DEFAULT_PAGE_SIZE)
+        self.memory_cap_spin = QSpinBox()
+        self.memory_cap_spin.setRange(16, 65_536)
+        self.memory_cap_spin.setSuffix(" MB")
+        self.memory_cap_spin.setValue(DEFAULT_MEMORY_CAP_MB)
+        self.result_cache_spin = QSpinBox()
+        self.result_cache_spin.setRange(0, 65_536)
+        self.result_cache_spin.setSuffix(" MB")
+        self.result_cache_spin.setValue(DEFAULT_RESULT_CACHE_MB)
+        self.result_cache_spin.setToolTip("Memory kept for re-running identical queries (0 disables the cache)")
+        self.result_cache_spin.valueChanged.connect(self.on_result_cache_budget)
+        self.result_status = QLabel("")
+        paging_layout.addWidget(QLabel("Page size"))
+        paging_layout.addWidget(self.page_size_spin)
+        paging_layout.addWidget(QLabel("Memory cap"))
+        paging_layout.addWidget(self.memory_cap_spin)
+        paging_layout.addWidget(QLabel("Result cache"))
+        paging_layout.addWidget(self.result_cache_spin)
+        paging_layout.addStretch()
+        paging_layout.addWidget(self.result_status)
+        table_layout.addLayout(paging_layout)
+        self.result_model.rowsInserted.connect(self.update_result_status)
+
         export_layout = QHBoxLayout()
-        self.export_csv_btn = QPushButton("⬇ Export CSV")
+        self.export_csv_btn = QPushButton("⬇ Export CSV / Parquet")
         self.export_csv_btn.clicked.connect(self.export_csv)
         self.export_xlsx_btn = QPushButton("⬇ Export Excel")
         self.export_xlsx_btn.clicked.connect(self.export_xlsx)
@@ -191,6 +784,14 @@ class SQLExplorer(QWidget):
         self.y_dropdown = QComboBox()
         self.chart_type = QComboBox()
         self.chart_type.addItems(["Bar", "Line", "Scatter"])
+        self.agg_dropdown = QComboBox()
+        self.agg_dropdown.addItems(list(AGGREGATES))
+        self.agg_dropdown.setToolTip("How Y is aggregated per bar (bars are grouped or binned in DuckDB)")
+        self.density_spin = QSpinBox()
+        self.density_spin.setRange(1_000, 100_000_000)
+        self.density_spin.setSingleStep(10_000)
+        self.density_spin.setValue(DEFAULT_DENSITY_THRESHOLD)
+        self.density_spin.setToolTip("Scatter plots with more points than this are drawn as a density image")
         self.plot_btn = QPushButton("📊 Plot")
         self.plot_btn.clicked.connect(self.plot_chart)
         ctrl_layout.addWidget(QLabel("X-axis"))
@@ -199,17 +800,31 @@ class SQLExplorer(QWidget):
         ctrl_layout.addWidget(self.y_dropdown)
         ctrl_layout.addWidget(QLabel("Type"))
         ctrl_layout.addWidget(self.chart_type)
+        ctrl_layout.addWidget(QLabel("Aggregate"))
+        ctrl_layout.addWidget(self.agg_dropdown)
+        ctrl_layout.addWidget(QLabel("Density above"))
+        ctrl_layout.addWidget(self.density_spin)
         ctrl_layout.addWidget(self.plot_btn)
         viz_layout.addLayout(ctrl_layout)
-
-        self.figure = plt.Figure()
-        self.canvas = FigureCanvas(self.figure)
+        self.viz_layout = viz_layout
+        self.plot_info = QLabel("")
+        viz_layout.addWidget(self.plot_info)
+
+        # The matplotlib canvas is created on first use of this tab.
+        self.figure = None
+        self.canvas = None
+        self.plot_state = None
+        self.hover_cid = None
+        self.refine_timer = QTimer(self)
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(300)
+        self.refine_timer.timeout.connect(self.refine_plot)
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setWidget(self.canvas)
         viz_layout.addWidget(self.scroll_area)
 
-        self.tabs.addTab(viz_tab, "Visualization")
+        self.viz_tab_index = self.tabs.addTab(viz_tab, "Visualization")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
         results_layout.addWidget(self.tabs)
         right_splitter.addWidget(results_widget)
 
@@ -224,9 +839,57 @@ class SQLExplorer(QWidget):
 
         main_layout.addWidget(main_splitter)
 
+        # Per-phase timings of the last run (see begin_run / finish_run).
+        self.perf_bar = QStatusBar()
+        self.perf_bar.setSizeGripEnabled(False)
+        self.cprofile_check = QCheckBox("cProfile next run")
+        self.cprofile_check.setToolTip("Profile every phase of the next run and save a .prof file")
+        self.memory_status = QLabel()
+        self.perf_bar.addPermanentWidget(self.memory_status)
+        self.perf_bar.addPermanentWidget(self.cprofile_check)
+        main_layout.addWidget(self.perf_bar)
+        self.memory_timer = QTimer(self)
+        self.memory_timer.setInterval(2000)
+        self.memory_timer.timeout.connect(self.update_memory_status)
+        self.memory_timer.start()
+
         apply_dark_theme(QApplication.instance())
 
     
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_callback is not None:
+            callback, self.first_paint_callback = self.first_paint_callback, None
+            QTimer.singleShot(0, callback)
+
+    def on_llm_toggled(self, checked):
+        if not checked or self.remote_url is not None:
+            return
+        try:
+            get_client()
+        except Exception as ex:
+            QMessageBox.warning(self, "LLM unavailable", str(ex))
+            self.use_llm_checkbox.setChecked(False)
+
+    def on_tab_changed(self, index):
+        if index == self.viz_tab_index:
+            self.ensure_viz()
+
+    def ensure_viz(self):
+        if self.figure is not None:
+            return
+        import matplotlib
+        matplotlib.use("Qt5Agg")
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qt5agg import (
+            FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT,
+        )
+        self.figure = Figure()
+        self.canvas = FigureCanvas(self.figure)
+        self.scroll_area.setWidget(self.canvas)
+        # Pan/zoom re-queries DuckDB for the visible x range (see refine_plot).
+        self.viz_layout.insertWidget(2, NavigationToolbar2QT(self.canvas, self))
+
     def add_file(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Open File", "", "Data Files (*.csv *.xlsx *.xls)"
@@ -242,38 +905,118 @@ class SQLExplorer(QWidget):
         alias = alias.strip()
         try:
             if ext == ".csv":
-                df = pd.read_csv(file_path)
-                self.register_alias(alias, df, file_path, sheet="-")
+                self.register_alias(alias, file_path, sheet="-")
             else:
-                xls = pd.ExcelFile(file_path)
-                sheet, ok2 = QInputDialog.getText(
-                    self, "Sheet", f"Enter sheet name (default={xls.sheet_names[0]}):"
-                )
-                if not ok2:
-                    return
-                sheet = sheet.strip() or xls.sheet_names[0]
-                df = pd.read_excel(file_path, sheet_name=sheet)
-                self.register_alias(alias, df, file_path, sheet=sheet)
+                self.add_excel(file_path, alias)
         except Exception as ex:
             QMessageBox.critical(self, "Error", str(ex))
 
-    def register_alias(self, alias, df, file_path, sheet="-"):
-        if alias in self.tables:
-            self.conn.unregister(alias)
-        self.conn.register(alias, df)
-        self.tables[alias] = {"df": df, "file": os.path.basename(file_path), "sheet": sheet, "context": ""}
+    def add_excel(self, file_path, alias):
+        sheet_names, xls = self.engine.excel_sheet_names(file_path)
+        dialog = SheetPickerDialog(os.path.basename(file_path), sheet_names, self)
+        if dialog.exec_() != QDialog.Accepted or not dialog.selected_sheets():
+            return
+        sheets = dialog.selected_sheets()
+        if len(sheets) == 1:
+            pairs = [(alias, sheets[0])]
+        else:
+            pairs = [(sheet_alias(alias, sheet), sheet) for sheet in sheets]
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            self.engine.ingest_excel(file_path, pairs, xls=xls)
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.refresh_file_table()
+        self.show_schema(pairs[-1][0])
+
+    def register_alias(self, alias, file_path, sheet="-", df=None, kind=None, context="", scan=None):
+        self.engine.register_alias(alias, file_path, sheet, df, kind, context, scan)
+        self.refresh_file_table()
+        self.show_schema(alias)
+
+    def add_folder(self):
+        if self.is_busy():
+            return
+        dialog = BulkIngestDialog(self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        pattern, alias, with_filename = dialog.values()
+        if not alias:
+            return
+        files = glob_files(pattern)
+        if not files:
+            QMessageBox.warning(self, "No Files", f"No files match {pattern}")
+            return
+        sql, kind, scan = self.engine.glob_ingest(alias, pattern, with_filename)
+        worker = StatementWorker(
+            self.engine.conn, sql,
+            after=lambda cursor: relation_row_count(cursor, staging_alias(alias)), parent=self,
+        )
+        worker.done.connect(lambda rows: self.on_folder_ingested(alias, pattern, kind, scan, rows))
+        worker.failed.connect(lambda _: self.engine.discard_glob(alias, kind))
+        self.start_job(worker, "Add Folder / Glob", f"Ingesting {len(files):,} files into {alias}…")
+
+    def on_folder_ingested(self, alias, pattern, kind, scan, rows):
+        self.engine.adopt_glob(alias, pattern, kind, scan, rows=rows)
         self.refresh_file_table()
         self.show_schema(alias)
 
+    # --- Background jobs (bulk ingestion, exports) ---
+    def start_job(self, worker, title, label):
+        self.job_worker = worker
+        progress = QProgressDialog(label, "Cancel", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(worker.cancel)
+        poll = QTimer(progress)
+        poll.setInterval(200)
+        poll.timeout.connect(lambda: self.update_job_progress(progress, label))
+        poll.start()
+        worker.failed.connect(lambda message: self.on_job_failed(title, message))
+        worker.finished.connect(lambda: self.on_job_done(progress))
+        worker.start()
+
+    def update_job_progress(self, progress, label):
+        if self.job_worker is None:
+            return
+        percent = self.job_worker.progress()
+        if percent >= 0:
+            progress.setRange(0, 100)
+            progress.setValue(int(percent))
+        detail = self.job_worker.detail()
+        if detail:
+            progress.setLabelText(f"{label}\n{detail}")
+
+    def on_job_failed(self, title, message):
+        if not self.job_worker.cancelled:
+            QMessageBox.critical(self, f"{title} Error", message)
+
+    def on_job_done(self, progress):
+        # Closing a QProgressDialog emits canceled(), which must not reach the worker.
+        progress.canceled.disconnect()
+        progress.close()
+        self.job_worker.deleteLater()
+        self.job_worker = None
+
     def refresh_file_table(self):
         self.table_list.setRowCount(0)
-        for alias, meta in self.tables.items():
+        for alias, meta in self.catalog().items():
             row = self.table_list.rowCount()
             self.table_list.insertRow(row)
             self.table_list.setItem(row, 0, QTableWidgetItem(alias))
             self.table_list.setItem(row, 1, QTableWidgetItem(meta["file"]))
             self.table_list.setItem(row, 2, QTableWidgetItem(meta["sheet"]))
-            self.table_list.setItem(row, 3, QTableWidgetItem(str(len(meta["df"]))))
+            self.table_list.setItem(row, 3, QTableWidgetItem(str(meta["files"])))
+            self.table_list.setItem(row, 4, QTableWidgetItem(str(meta["rows"])))
+            storage = meta.get("storage_bytes")
+            memory_item = QTableWidgetItem("view" if storage is None else f"{storage / 2**20:,.1f} MB")
+            memory_item.setToolTip(
+                "Reads the file on every query" if storage is None else "Compressed size inside DuckDB"
+            )
+            self.table_list.setItem(row, 5, memory_item)
+            if self.remote_url is not None:
+                continue
 
             # Edit icon (flat & transparent)
             btn_edit = QPushButton()
@@ -284,7 +1027,7 @@ class SQLExplorer(QWidget):
             btn_edit.setStyleSheet("background-color: transparent; border: none;")
             btn_edit.setToolTip("Edit alias/sheet")
             btn_edit.clicked.connect(lambda _, a=alias: self.edit_table(a))
-            self.table_list.setCellWidget(row, 4, btn_edit)
+            self.table_list.setCellWidget(row, 6, btn_edit)
 
             # Remove icon (flat & transparent)
             btn_remove = QPushButton()
@@ -295,53 +1038,208 @@ class SQLExplorer(QWidget):
             btn_remove.setStyleSheet("background-color: transparent; border: none;")
             btn_remove.setToolTip("Remove table")
             btn_remove.clicked.connect(lambda _, a=alias: self.remove_table(a))
-            self.table_list.setCellWidget(row, 5, btn_remove)
+            self.table_list.setCellWidget(row, 7, btn_remove)
 
-        
+        self.update_cache_status()
         if self.table_list.rowCount() > 0:
             self.table_list.selectRow(0)
             alias = self.table_list.item(0, 0).text()
             self.show_schema(alias)
 
     def edit_table(self, alias):
-        meta = self.tables[alias]
         new_alias, ok = QInputDialog.getText(self, "Edit Alias", "Alias:", text=alias)
         if not ok or not new_alias.strip():
             return
-        new_alias = new_alias.strip()
-        df = meta["df"]
-        self.conn.unregister(alias)
-        self.conn.register(new_alias, df)
-        self.tables.pop(alias)
-        self.tables[new_alias] = meta
+        self.save_context()
+        try:
+            self.engine.rename_alias(alias, new_alias.strip())
+        except Exception as ex:
+            QMessageBox.warning(self, "Edit Alias", str(ex))
+            return
         self.refresh_file_table()
-        self.show_schema(new_alias)
+        self.show_schema(new_alias.strip())
 
     def remove_table(self, alias):
-        if alias in self.tables:
-            self.conn.unregister(alias)
-            self.tables.pop(alias)
+        if alias in self.engine.tables:
+            self.engine.remove_alias(alias)
             self.refresh_file_table()
             self.schema_info.clear()
-            self.context_editor.clear()
+            self.show_context("")
 
     def on_table_clicked(self, row, col):
         alias_item = self.table_list.item(row, 0)
         if alias_item:
             alias = alias_item.text()
             self.show_schema(alias)
-            self.context_editor.setText(self.tables[alias].get("context", ""))
+            self.show_context(self.catalog()[alias].get("context") or "")
 
     def show_schema(self, alias):
-        df = self.tables[alias]["df"]
-        text = "\n".join(f"{c}: {df[c].dtype}" for c in df.columns)
+        meta = self.catalog()[alias]
+        profile = meta.get("profile")
+        if profile is None:
+            text = "\n".join(f"{c}: {t}" for c, t in meta["columns"])
+            text += "\n\n(profiling…)" if self.profiling(meta) else ""
+        else:
+            text = "\n".join(
+                f"{c}: {t}" + (f"\n    {describe_column_stats(profile[c])}" if c in profile else "")
+                for c, t in meta["columns"]
+            )
         self.schema_info.setPlainText(text)
 
-    def save_context(self):
+    # --- Background profiling ---
+    # Called by the engine for every new alias, after any cached profile was
+    # loaded. Metas (not aliases) are queued so a rename while profiling still
+    # lands the statistics on the right table.
+    def queue_profile(self, alias):
+        meta = self.engine.tables[alias]
+        if meta["profile"] is not None:
+            return
+        self.profile_queue.append(meta)
+        self.start_next_profile()
+
+    def profiling(self, meta):
+        queued = any(m is meta for m in self.profile_queue)
+        return queued or (self.profile_worker is not None and self.profile_worker.meta is meta)
+
+    def alias_for(self, meta):
+        return next((a for a, m in self.engine.tables.items() if m is meta), None)
+
+    def start_next_profile(self):
+        while self.profile_worker is None and self.profile_queue:
+            meta = self.profile_queue.pop(0)
+            alias = self.alias_for(meta)
+            if alias is None:
+                continue
+            worker = ProfileWorker(self.engine.conn, alias, meta, self)
+            worker.done.connect(lambda profile, w=worker: self.on_profile_done(w, profile))
+            worker.finished.connect(lambda w=worker: self.on_profile_finished(w))
+            self.profile_worker = worker
+            worker.start()
+
+    def on_profile_done(self, worker, profile):
+        alias = self.engine.set_profile(worker.meta, profile)
+        if alias is None:
+            return
+        self.update_cache_status()
+        row = self.table_list.currentRow()
+        if row >= 0 and self.table_list.item(row, 0).text() == alias:
+            self.show_schema(alias)
+
+    def on_profile_finished(self, worker):
+        worker.deleteLater()
+        if self.profile_worker is worker:
+            self.profile_worker = None
+            self.start_next_profile()
+
+    def stop_profiling(self):
+        self.profile_queue.clear()
+        if self.profile_worker is not None:
+            self.profile_worker.cancel()
+            self.profile_worker.wait()
+            self.profile_worker = None
+
+    # The alias is taken when typing starts: by the time the timer fires the
+    # selection may already point at another table.
+    def on_context_edited(self):
         row = self.table_list.currentRow()
-        if row >= 0:
-            alias = self.table_list.item(row, 0).text()
-            self.tables[alias]["context"] = self.context_editor.toPlainText()
+        if row >= 0 and self.remote_url is None:
+            self.context_alias = self.table_list.item(row, 0).text()
+            self.context_timer.start()
+
+    def save_context(self):
+        self.context_timer.stop()
+        alias, self.context_alias = self.context_alias, None
+        if alias in self.engine.tables and self.engine.set_context(alias, self.context_editor.toPlainText()):
+            self.update_cache_status()
+
+    # Loading another table's context is not an edit: any pending edit is
+    # saved first and textChanged stays quiet.
+    def show_context(self, text):
+        self.save_context()
+        self.context_editor.blockSignals(True)
+        self.context_editor.setText(text)
+        self.context_editor.blockSignals(False)
+
+    # --- Workspace ---
+    def open_workspace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Open or Create Workspace", "", "DuckDB Workspace (*.duckdb)",
+            options=QFileDialog.DontConfirmOverwrite,
+        )
+        if not path:
+            return
+        if not path.endswith(".duckdb"):
+            path += ".duckdb"
+        try:
+            self.load_workspace(path)
+        except Exception as ex:
+            QMessageBox.critical(self, "Workspace Error", str(ex))
+
+    def load_workspace(self, path):
+        if self.is_busy():
+            return
+        self.save_context()
+        self.stop_profiling()
+        if self.current_result is not None:
+            self.current_result.close()
+            self.current_result = None
+            self.engine.result_cache.pinned = None
+        reingested, failed = self.engine.open_workspace(path)
+        self.workspace_label.setText(
+            f"Workspace: {os.path.basename(path)} "
+            f"({len(self.engine.tables)} tables, {len(reingested)} re-ingested"
+            + (f", {len(failed)} failed)" if failed else ")")
+        )
+        self.result_model.clear()
+        self.refresh_file_table()
+        if not self.engine.tables:
+            self.schema_info.clear()
+            self.show_context("")
+        if failed:
+            QMessageBox.warning(
+                self, "Workspace", "Some tables could not be refreshed:\n\n"
+                + "\n".join(f"{alias}: {error}" for alias, error in failed.items())
+            )
+
+    # --- Query service (thin client) ---
+    # Tables, SQL generation and queries all live in the server; this window
+    # only lists the catalog and pages Arrow results into the grid.
+    def catalog(self):
+        return self.remote_catalog if self.remote_url is not None else self.engine.tables
+
+    def connect_server(self):
+        if self.is_busy():
+            return
+        url, ok = QInputDialog.getText(
+            self, "Query Server", "Server URL (leave empty to use local tables):",
+            text=self.remote_url or "http://127.0.0.1:8765",
+        )
+        if not ok:
+            return
+        self.save_context()
+        url = url.strip().rstrip("/")
+        try:
+            catalog = remote_tables(url) if url else {}
+        except Exception as ex:
+            QMessageBox.critical(self, "Server Error", f"Could not reach {url}: {ex}")
+            return
+        if self.current_result is not None:
+            self.current_result.close()
+            self.current_result = None
+            self.engine.result_cache.pinned = None
+        self.result_model.clear()
+        self.table_list.setRowCount(0)
+        self.remote_url, self.remote_catalog = url or None, catalog
+        local = self.remote_url is None
+        # Ingestion, exports and charts need the tables in this process.
+        for widget in (self.add_file_btn, self.add_folder_btn, self.workspace_btn, self.ingest_mode,
+                       self.settings_btn, self.export_csv_btn, self.export_xlsx_btn, self.plot_btn):
+            widget.setEnabled(local)
+        self.context_editor.setReadOnly(not local)
+        self.server_btn.setText("🌐 Connect to Server…" if local else f"🌐 {url}")
+        self.schema_info.clear()
+        self.show_context("")
+        self.refresh_file_table()
 
     # --- Query ---
     def preview_llm_query(self):
@@ -349,40 +1247,237 @@ class SQLExplorer(QWidget):
             QMessageBox.information(self, "Info", "Enable LLM first.")
             return
         prompt = self.sql_editor.toPlainText().strip()
-        if not prompt:
+        if not prompt or self.is_busy():
             return
-        sql = generate_sql_from_prompt(prompt, self.tables)
-        QMessageBox.information(self, "Preview Generated SQL", sql)
+        # Answers are cached, so a following Run with the same prompt reuses this SQL.
+        self.begin_run(prompt)
+        self.start_llm(prompt, run_after=False)
+
+    def update_cache_status(self):
+        cache = self.engine.sql_cache
+        text = f"NL cache: {cache.hits} hits / {cache.misses} misses ({len(cache.entries)} stored)"
+        if self.last_prompt_tokens is not None:
+            text += f" · last prompt ≈ {self.last_prompt_tokens:,} tokens"
+        self.cache_status.setText(text)
+
+    def is_busy(self):
+        return any(w is not None for w in (self.query_worker, self.llm_worker, self.job_worker))
 
     def run_query(self):
+        if self.is_busy():
+            return
         if self.use_llm_checkbox.isChecked():
             prompt = self.sql_editor.toPlainText().strip()
-            if not prompt:
-                return
-            sql_to_run = generate_sql_from_prompt(prompt, self.tables)
-        else:
-            sql_to_run = self.sql_editor.toPlainText().strip()
-        if not sql_to_run:
+            if prompt:
+                self.begin_run(prompt)
+                self.start_llm(prompt, run_after=True)
+            return
+        sql_to_run = self.sql_editor.toPlainText().strip()
+        if sql_to_run:
+            self.begin_run(sql_to_run)
+            self.start_query(sql_to_run)
+
+    # --- Memory ---
+    def edit_duckdb_settings(self):
+        dialog = DuckDBSettingsDialog(self.engine.settings, self)
+        if dialog.exec_() != QDialog.Accepted:
             return
         try:
-            df = self.conn.execute(sql_to_run).df()
-            self.current_result_df = df
-            self.display_results(df)
+            self.engine.configure(dialog.values())
         except Exception as ex:
-            QMessageBox.critical(self, "Query Error", str(ex))
-
-    def display_results(self, df):
-        self.result_table.setRowCount(0)
-        self.result_table.setColumnCount(len(df.columns))
-        self.result_table.setHorizontalHeaderLabels(df.columns)
-        for i, row in df.iterrows():
-            self.result_table.insertRow(i)
-            for j, val in enumerate(row):
-                self.result_table.setItem(i, j, QTableWidgetItem(str(val)))
+            QMessageBox.critical(self, "DuckDB Settings", str(ex))
+            return
+        save_duckdb_settings(self.engine.settings)
+        self.update_memory_status()
+
+    def update_memory_status(self):
+        usage = self.engine.memory_usage()
+        parts = []
+        if usage is not None:
+            used, limit = usage
+            parts.append(f"DuckDB {used / 2**20:,.1f} MB of {limit}")
+        if self.current_result is not None:
+            parts.append(f"result {self.current_result.memory_bytes / 2**20:,.1f} MB")
+        self.memory_status.setText(" · ".join(parts))
+
+    # --- Run timings ---
+    def begin_run(self, label):
+        capture = self.cprofile_check.isChecked()
+        self.run_timings = RunTimings(label, capture=capture)
+        if capture:
+            self.cprofile_check.setChecked(False)
+
+    def run_span(self, phase):
+        return self.run_timings.span(phase) if self.run_timings is not None else nullcontext()
+
+    def finish_run(self, status="ok", **extra):
+        timings, self.run_timings = self.run_timings, None
+        if timings is not None:
+            self.log_timings(timings, status=status, **extra)
+
+    def log_timings(self, timings, **extra):
+        text = timings.summary() or "no timed phases"
+        if extra.get("cached"):
+            text = "cached result · " + text
+        record = timings.record(**extra)
+        path = timings.save_cprofile()
+        if path:
+            record["cprofile"] = path
+            text += f" · cProfile saved to {path}"
+        try:
+            append_timing_log(record)
+        except OSError as ex:
+            text += f" · timing log not written: {ex}"
+        status = extra.get("status", "ok")
+        self.perf_bar.showMessage(f"⏱ {text}" if status == "ok" else f"⏱ {status}: {text}")
+
+    def start_llm(self, prompt, run_after):
+        self.llm_preview.clear()
+        self.query_status.setToolTip("")
+        self.pending_sql = None
+        self.llm_worker = LLMWorker(
+            prompt, self.engine.schema_digests, self.engine.sql_cache, self.llm_timeout_spin.value(),
+            self.remote_url, self.run_timings, self
+        )
+        self.llm_worker.token.connect(self.llm_preview.setPlainText)
+        self.llm_worker.sql_ready.connect(lambda sql: self.on_sql_generated(sql, run_after))
+        self.llm_worker.finished.connect(self.on_llm_done)
+        self.set_query_running(True, "Generating SQL")
+        self.llm_worker.start()
+
+    def on_sql_generated(self, sql, run_after):
+        self.llm_preview.setPlainText(sql)
+        if sql.startswith(LLM_ERROR_PREFIX):
+            self.llm_worker.failed = True
+            QMessageBox.critical(self, "LLM Error", sql)
+        elif run_after:
+            self.pending_sql = sql
+
+    def on_llm_done(self):
+        worker, self.llm_worker = self.llm_worker, None
+        worker.deleteLater()
+        self.set_query_running(False)
+        if worker.prompt_tokens is not None:
+            self.last_prompt_tokens = worker.prompt_tokens
+        self.update_cache_status()
+        if worker.cancelled:
+            self.query_status.setText("SQL generation cancelled")
+        elif worker.failed:
+            self.query_status.setText("SQL generation failed")
+        else:
+            total = len(self.catalog()) if self.remote_url else len(self.engine.schema_digests.entries)
+            self.query_status.setText(f"SQL generated from {len(worker.included)} of {total} tables")
+            self.query_status.setToolTip("Tables in prompt: " + ", ".join(worker.included))
+        sql, self.pending_sql = self.pending_sql, None
+        if sql and not worker.cancelled:
+            self.start_query(sql)
+        else:
+            self.finish_run("cancelled" if worker.cancelled else "failed" if worker.failed else "ok")
+
+    def start_query(self, sql_to_run):
+        if self.remote_url is not None:
+            cache_key, aliases, cached = None, set(), None
+        else:
+            cache_key, aliases, cached = self.engine.lookup_result(sql_to_run)
+        if cached is not None:
+            self.show_result(cached, from_cache=True)
+            self.query_status.setText(
+                f"Cached result — query not re-run ({self.engine.result_cache.hits} cache hits)"
+            )
+            return
+        if self.remote_url is not None:
+            result = RemoteQueryResult(
+                self.remote_url, sql_to_run,
+                page_size=self.page_size_spin.value(),
+                memory_cap_mb=self.memory_cap_spin.value(),
+                timings=self.run_timings,
+            )
+        else:
+            result = QueryResult(
+                self.engine.conn, sql_to_run,
+                page_size=self.page_size_spin.value(),
+                memory_cap_mb=self.memory_cap_spin.value(),
+                timings=self.run_timings,
+            )
+        self.query_worker = QueryWorker(result, self)
+        self.query_worker.cache_key = cache_key
+        self.query_worker.cache_aliases = aliases
+        self.query_worker.result_ready.connect(self.on_query_result)
+        self.query_worker.failed.connect(self.on_query_failed)
+        self.query_worker.finished.connect(self.on_query_done)
+        self.set_query_running(True)
+        self.query_worker.start()
+
+    def cancel_query(self):
+        for worker in (self.llm_worker, self.query_worker):
+            if worker is not None:
+                self.query_status.setText("Cancelling…")
+                worker.cancel()
+
+    def set_query_running(self, running, activity="Running"):
+        self.run_btn.setEnabled(not running)
+        self.preview_btn.setEnabled(not running)
+        self.cancel_btn.setEnabled(running)
+        # A 0..0 range turns the bar into a busy indicator.
+        self.query_progress.setRange(0, 0 if running else 1)
+        if running:
+            self.running_activity = activity
+            self.query_clock.start()
+            self.elapsed_timer.start()
+            self.update_elapsed()
+        else:
+            self.elapsed_timer.stop()
+
+    def update_elapsed(self):
+        self.query_status.setText(
+            f"{self.running_activity}… {self.query_clock.elapsed() / 1000:.1f} s"
+        )
+
+    def on_query_result(self, result):
+        worker = self.query_worker
+        self.engine.result_cache.pinned = result
+        self.engine.store_result(worker.cache_key, worker.cache_aliases, result)
+        self.show_result(result)
+        self.query_status.setText(f"Finished in {self.query_clock.elapsed() / 1000:.2f} s")
+
+    def show_result(self, result, from_cache=False):
+        previous, self.current_result = self.current_result, result
+        self.engine.result_cache.pinned = result
+        self.current_from_cache = from_cache
+        if previous is not None and previous is not result and not self.engine.result_cache.holds(previous):
+            previous.close()
+        with self.run_span("render"):
+            self.display_results(result)
+        self.last_timings = self.run_timings
+        self.finish_run(sql=result.sql, rows=result.row_count, cached=from_cache)
+
+    def on_result_cache_budget(self, budget_mb):
+        self.engine.result_cache.budget = budget_mb * 1024 * 1024
+        self.engine.result_cache.trim()
+
+    def on_query_failed(self, message):
+        if self.query_worker.cancelled:
+            self.query_status.setText("Query cancelled")
+            self.finish_run("cancelled")
+            return
+        self.query_status.setText("Query failed")
+        self.finish_run("failed", error=message)
+        QMessageBox.critical(self, "Query Error", message)
+
+    def on_query_done(self):
+        self.set_query_running(False)
+        self.query_worker.deleteLater()
+        self.query_worker = None
+
+    def display_results(self, result):
+        from pandas.api.types import is_numeric_dtype
+        self.result_model.set_result(result)
+        self.update_result_status()
         self.x_dropdown.clear()
         self.y_dropdown.clear()
-        num_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
-        cat_cols = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        dtypes = result.dtypes
+        num_cols = [c for c in result.columns if is_numeric_dtype(dtypes[c])]
+        cat_cols = [c for c in result.columns if not is_numeric_dtype(dtypes[c])]
         self.x_dropdown.addItems(cat_cols + num_cols)
         self.y_dropdown.addItems(num_cols)
         if cat_cols:
@@ -390,9 +1485,35 @@ class SQLExplorer(QWidget):
         if num_cols:
             self.y_dropdown.setCurrentText(num_cols[0])
 
+    def update_result_status(self, *_):
+        result = self.current_result
+        if result is None:
+            self.result_status.clear()
+            return
+        self.engine.result_cache.trim()
+        text = f"{result.row_count:,} rows loaded ({result.memory_bytes / 2**20:.1f} MB)"
+        if self.current_from_cache:
+            text = "⚡ Cached · " + text
+        if result.truncated:
+            text += " — memory cap reached"
+        elif result.has_more():
+            text += " — scroll for more"
+        self.result_status.setText(text)
+
     # --- Visualization ---
+    # The plot span is added to the run that produced the displayed result.
     def plot_chart(self):
-        if self.current_result_df is None or self.current_result_df.empty:
+        timings = self.last_timings
+        if timings is None or self.current_result is None:
+            self.draw_chart()
+            return
+        timings.spans.pop("plot", None)
+        with timings.span("plot"):
+            self.draw_chart()
+        self.log_timings(timings, status="ok", event="plot", chart=self.chart_type.currentText())
+
+    def draw_chart(self):
+        if self.current_result is None or self.current_result.row_count == 0:
             QMessageBox.warning(self, "No Data", "Run a query first.")
             return
         x_col = self.x_dropdown.currentText()
@@ -400,42 +1521,253 @@ class SQLExplorer(QWidget):
         chart_type = self.chart_type.currentText()
         if not x_col or not y_col:
             return
-        n = len(self.current_result_df[x_col].unique())
-        width = max(8, n * 0.5)
+        import mplcursors
+        self.ensure_viz()
+        # A zoom queued against the previous chart must not refine this one.
+        self.refine_timer.stop()
+        result = self.current_result
+        cursor = open_cursor(self.engine.conn)
+        try:
+            kind = column_kind(cursor, result.select_sql, x_col)
+            self.plot_state = {
+                "chart": chart_type, "x": x_col, "y": y_col, "kind": kind,
+                "agg": AGGREGATES[self.agg_dropdown.currentText()],
+                "sql": result.select_sql, "artist": None,
+            }
+            if chart_type == "Scatter" and kind != "category":
+                y_kind = column_kind(cursor, result.select_sql, y_col)
+                points = cursor.execute(
+                    f"SELECT COUNT(*) FROM (\n{result.select_sql}\n) "
+                    f"WHERE {quote_ident(x_col)} IS NOT NULL AND {quote_ident(y_col)} IS NOT NULL"
+                ).fetchone()[0]
+                if y_kind != "category" and points > self.density_spin.value():
+                    chart_type = self.plot_state["chart"] = "Density"
+                    self.plot_state["y_kind"] = y_kind
+            if chart_type == "Density":
+                density = self.fetch_density(cursor)
+                width = 8
+            elif chart_type == "Scatter":
+                df, truncated = result.collect([x_col] if x_col == y_col else [x_col, y_col])
+                self.plot_info.setText("")
+                if truncated:
+                    self.plot_info.setText(f"Plotting the first {len(df):,} rows (memory cap reached)")
+                width = 8
+            else:
+                points = self.fetch_plot_points(cursor)
+                width = 8
+                if chart_type == "Bar":
+                    width = min(max(8, len(points[0]) * 0.5), MAX_FIGURE_WIDTH_IN)
+        except Exception as ex:
+            QMessageBox.critical(self, "Plot Error", str(ex))
+            return
+        finally:
+            cursor.close()
+
         self.figure.set_size_inches(width, 6)
+        self.canvas.setMinimumWidth(int(width * self.figure.dpi) if width > 8 else 0)
         self.figure.clear()
+        if self.hover_cid is not None:
+            self.canvas.mpl_disconnect(self.hover_cid)
+            self.hover_cid = None
         ax = self.figure.add_subplot(111)
-        if chart_type == "Bar":
-            ax.bar(self.current_result_df[x_col], self.current_result_df[y_col])
-        elif chart_type == "Line":
-            ax.plot(self.current_result_df[x_col], self.current_result_df[y_col])
+        if chart_type == "Density":
+            self.draw_density(ax, density)
+            ax.callbacks.connect("xlim_changed", lambda _ax: self.refine_timer.start())
+            ax.callbacks.connect("ylim_changed", lambda _ax: self.refine_timer.start())
+            self.hover_cid = self.canvas.mpl_connect("motion_notify_event", self.on_density_hover)
         elif chart_type == "Scatter":
-            ax.scatter(self.current_result_df[x_col], self.current_result_df[y_col])
+            ax.scatter(df[x_col], df[y_col])
+        else:
+            self.draw_plot_points(ax, points)
+            if kind != "category":
+                ax.autoscale_view()
+                ax.set_autoscale_on(False)
+                ax.callbacks.connect("xlim_changed", lambda _ax: self.refine_timer.start())
         ax.set_xlabel(x_col)
         ax.set_ylabel(y_col)
         ax.set_title(f"{chart_type} Chart of {y_col} vs {x_col}")
         for tick in ax.get_xticklabels():
             tick.set_rotation(45)
             tick.set_horizontalalignment("right")
-        mplcursors.cursor(ax, hover=True)
+        if chart_type != "Density":
+            # Hover hit-testing walks every artist, so density images use
+            # on_density_hover's bin lookup instead.
+            mplcursors.cursor(ax, hover=True)
         self.canvas.draw()
 
-    
+    def fetch_plot_points(self, cursor, bounds=None):
+        state = self.plot_state
+        if state["chart"] == "Line" and state["kind"] != "category":
+            n_out = max(self.scroll_area.viewport().width(), 200)
+            xs, ys, count = line_points(cursor, state["sql"], state["x"], state["y"], state["kind"], n_out, bounds)
+            self.plot_info.setText(f"{len(xs):,} of {count:,} points drawn (LTTB)")
+            return xs, ys, None
+        xs, ys, bar_width, distinct = aggregate_bars(
+            cursor, state["sql"], state["x"], state["y"], state["agg"], state["kind"], bounds
+        )
+        if bar_width is not None:
+            self.plot_info.setText(f"{distinct:,} distinct x values binned into {len(xs)} bars")
+        elif distinct > len(xs):
+            self.plot_info.setText(f"Top {len(xs)} of {distinct:,} x values by {state['agg']}({state['y']})")
+        else:
+            self.plot_info.setText(f"{distinct:,} x values")
+        return xs, ys, bar_width
+
+    def draw_plot_points(self, ax, points):
+        xs, ys, bar_width = points
+        state = self.plot_state
+        if state["chart"] == "Line":
+            state["artist"] = ax.plot(xs, ys)[0]
+        elif bar_width is not None:
+            state["artist"] = ax.bar(xs, ys, width=bar_width)
+        else:
+            state["artist"] = ax.bar(xs, ys)
+
+    def fetch_density(self, cursor, bounds=None):
+        state = self.plot_state
+        grid, extent, total = density_grid(
+            cursor, state["sql"], state["x"], state["y"], (state["kind"], state["y_kind"]), bounds=bounds
+        )
+        self.plot_info.setText(f"{total:,} points binned into a {grid.shape[1]}×{grid.shape[0]} density grid")
+        return grid, extent
+
+    def draw_density(self, ax, density):
+        import numpy as np
+        from matplotlib.colors import LogNorm
+        grid, extent = density
+        state = self.plot_state
+        if extent is None:
+            return
+        state["grid"] = grid
+        state["extent"] = [
+            *plot_units(extent[:2], state["kind"]), *plot_units(extent[2:], state["y_kind"]),
+        ]
+        image = np.ma.masked_equal(grid, 0)
+        if state["artist"] is None:
+            state["artist"] = ax.imshow(
+                image, origin="lower", extent=state["extent"], aspect="auto",
+                norm=LogNorm(), cmap="viridis", interpolation="nearest",
+            )
+            self.figure.colorbar(state["artist"], ax=ax, label="points")
+            if state["kind"] == "temporal":
+                ax.xaxis_date()
+            state["hover"] = ax.annotate(
+                "", xy=(0, 0), xytext=(12, 12), textcoords="offset points",
+                bbox={"boxstyle": "round", "fc": "white", "alpha": 0.9}, visible=False,
+            )
+            ax.set_xlim(*state["extent"][:2])
+            ax.set_ylim(*state["extent"][2:])
+            ax.set_autoscale_on(False)
+        else:
+            state["artist"].set_data(image)
+            state["artist"].set_extent(state["extent"])
+            state["artist"].autoscale()
+
+    def on_density_hover(self, event):
+        state = self.plot_state
+        if state is None or state["chart"] != "Density" or "grid" not in state:
+            return
+        label = state["hover"]
+        x0, x1, y0, y1 = state["extent"]
+        rows, cols = state["grid"].shape
+        inside = event.inaxes is not None and x0 <= event.xdata < x1 and y0 <= event.ydata < y1
+        if inside:
+            bx = min(int((event.xdata - x0) / (x1 - x0) * cols), cols - 1)
+            by = min(int((event.ydata - y0) / (y1 - y0) * rows), rows - 1)
+            count = int(state["grid"][by, bx])
+            inside = count > 0
+        if inside:
+            ax = event.inaxes
+            label.xy = (event.xdata, event.ydata)
+            label.set_text(
+                f"{state['x']}: {ax.format_xdata(event.xdata)}\n"
+                f"{state['y']}: {ax.format_ydata(event.ydata)}\n{count:,} points"
+            )
+        if inside or label.get_visible():
+            label.set_visible(inside)
+            self.canvas.draw_idle()
+
+    def axis_bounds(self, lim, kind):
+        if kind == "temporal":
+            from matplotlib.dates import num2date
+            return [num2date(v).replace(tzinfo=None) for v in lim]
+        return list(lim)
+
+    # Called after pan/zoom settles: re-query only the visible range so the
+    # chart gains detail as the user zooms in.
+    def refine_plot(self):
+        state = self.plot_state
+        if state is None or state["kind"] == "category" or self.figure is None or not self.figure.axes:
+            return
+        ax = self.figure.axes[0]
+        bounds = self.axis_bounds(ax.get_xlim(), state["kind"])
+        cursor = open_cursor(self.engine.conn)
+        try:
+            if state["chart"] == "Density":
+                density = self.fetch_density(cursor, (bounds, self.axis_bounds(ax.get_ylim(), state["y_kind"])))
+            else:
+                points = self.fetch_plot_points(cursor, bounds)
+        except Exception as ex:
+            self.plot_info.setText(f"Could not refine: {ex}")
+            return
+        finally:
+            cursor.close()
+        if state["chart"] == "Density":
+            self.draw_density(ax, density)
+        else:
+            if state["artist"] is not None:
+                state["artist"].remove()
+            self.draw_plot_points(ax, points)
+        self.canvas.draw_idle()
+
+    # Exports re-run the last query through DuckDB's COPY, so they cover the
+    # whole result even when the grid only holds its first pages.
     def export_csv(self):
-        if self.current_result_df is None:
+        if self.current_result is None or self.is_busy():
             return
-        path, _ = QFileDialog.getSaveFileName(self, "Save CSV", "", "CSV Files (*.csv)")
-        if path:
-            self.current_result_df.to_csv(path, index=False)
+        path, selected = QFileDialog.getSaveFileName(self, "Export Result", "", EXPORT_FILTERS)
+        if not path:
+            return
+        if selected.startswith("Gzip") and not path.lower().endswith(".gz"):
+            path += ".gz" if path.lower().endswith(".csv") else ".csv.gz"
+        elif selected.startswith("Parquet") and not path.lower().endswith(".parquet"):
+            path += ".parquet"
+        worker = StatementWorker(
+            self.engine.conn, copy_statement(self.current_result.select_sql, path),
+            output_path=path, parent=self,
+        )
+        worker.done.connect(lambda _: self.query_status.setText(
+            f"Exported to {os.path.basename(path)} ({os.path.getsize(path) / 2**20:,.1f} MB)"
+        ))
+        self.start_job(worker, "Export", f"Exporting to {os.path.basename(path)}…")
 
     def export_xlsx(self):
-        if self.current_result_df is None:
+        if self.current_result is None or self.is_busy():
             return
         path, _ = QFileDialog.getSaveFileName(self, "Save Excel", "", "Excel Files (*.xlsx)")
-        if path:
-            self.current_result_df.to_excel(path, index=False)
+        if not path:
+            return
+        worker = XlsxExportWorker(
+            self.engine.conn, self.current_result.select_sql, path,
+            batch_size=self.page_size_spin.value(), parent=self,
+        )
+        worker.done.connect(lambda sheets: self.query_status.setText(
+            f"Exported {worker.rows_written:,} rows to {os.path.basename(path)} ({sheets} sheet(s))"
+        ))
+        self.start_job(worker, "Export", f"Exporting to {os.path.basename(path)}…")
+
+    def closeEvent(self, event):
+        self.save_context()
+        for worker in (self.llm_worker, self.query_worker, self.job_worker):
+            if worker is not None:
+                worker.cancel()
+                worker.wait()
+        self.stop_profiling()
+        self.engine.result_cache.clear()
+        if self.current_result is not None:
+            self.current_result.close()
+        super().closeEvent(event)
 
-    
     def toggle_theme(self):
         self.dark_mode = not self.dark_mode
         if self.dark_mode:
@@ -459,7 +1791,7 @@ def apply_dark_theme(app: QApplication):
     app.setStyleSheet("""
         QPushButton { background-color: #2d89ef; border: none; padding: 6px 12px; color: white; border-radius: 4px; }
         QPushButton:hover { background-color: #1b5fbd; }
-        QTextEdit, QTableWidget { border: 1px solid #555; border-radius: 4px; }
+        QTextEdit, QTableView { border: 1px solid #555; border-radius: 4px; }
         QLabel, QCheckBox { color: #ffffff; }
         QCheckBox { font-size: 11pt; }
         QComboBox { background-color: #2d2d30; color: #ffffff; border: 1px solid #555; border-radius: 4px; padding: 4px; }
@@ -483,7 +1815,7 @@ def apply_light_theme(app: QApplication):
     app.setStyleSheet("""
         QPushButton { background-color: #107C10; border: none; padding: 6px 12px; color: white; border-radius: 4px; }
         QPushButton:hover { background-color: #0B6A0B; }
-        QTextEdit, QTableWidget { border: 1px solid #ccc; border-radius: 4px; background: white; }
+        QTextEdit, QTableView { border: 1px solid #ccc; border-radius: 4px; background: white; }
         QLabel, QCheckBox { color: #323130; }
         QCheckBox { font-size: 11pt; }
         QComboBox { background-color: #ffffff; color: #323130; border: 1px solid #ccc; border-radius: 4px; padding: 4px; }
@@ -493,8 +1825,62 @@ def apply_light_theme(app: QApplication):
     """)
 
 
+# --- Startup report ---
+# `python main.py --startup-report` relaunches the app under `-X importtime`,
+# waits for the first paint and prints where the cold start went.
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def run_startup_probe(app, win, window_built_t):
+    phases = {
+        "module imports": MODULES_LOADED_T - STARTUP_T0,
+        "window construction": window_built_t - MODULES_LOADED_T,
+        "first paint": time.perf_counter() - window_built_t,
+        "total": time.perf_counter() - STARTUP_T0,
+    }
+    loaded = [m for m in HEAVY_MODULES if m in sys.modules]
+    print(json.dumps({"phases": phases, "heavy_modules_loaded": loaded}), flush=True)
+    win.close()
+    app.quit()
+
+
+def print_startup_report(top=15):
+    wall_t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--startup-probe"],
+        capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - wall_t0
+    if proc.returncode != 0 or not proc.stdout.strip():
+        print(proc.stderr, file=sys.stderr)
+        return 1
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+    imports = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        # Only top-level imports; nested ones are already in their parent's cumulative time.
+        if match and not match.group(3):
+            imports.append((int(match.group(2)), match.group(4)))
+    imports.sort(reverse=True)
+
+    print(f"Process wall time to first paint: {wall * 1000:8.1f} ms")
+    for name, seconds in probe["phases"].items():
+        print(f"  {name:<22}{seconds * 1000:8.1f} ms")
+    print(f"\nTop {top} top-level imports by cumulative time:")
+    for micros, name in imports[:top]:
+        print(f"  {name:<30}{micros / 1000:8.1f} ms")
+    loaded = probe["heavy_modules_loaded"]
+    print("\nHeavy modules loaded before first paint:", ", ".join(loaded) or "none")
+    return 0
+
+
 if __name__ == "__main__":
+    if "--startup-report" in sys.argv:
+        sys.exit(print_startup_report())
     app = QApplication(sys.argv)
     win = SQLExplorer()
+    if "--startup-probe" in sys.argv:
+        window_built_t = time.perf_counter()
+        win.first_paint_callback = lambda: run_startup_probe(app, win, window_built_t)
     win.show()
     sys.exit(app.exec_())
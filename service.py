@@ -0,0 +1,381 @@
+# Local HTTP query service: tables are loaded once into one Engine and many
+# clients query them concurrently through a pool of DuckDB cursors. The same
+# module holds the client side used by the desktop app's thin-client mode.
+#
+#   python service.py -t sales=data/sales.csv -t logs='logs/*.parquet' --port 8765
+#
+#   GET  /tables                          catalog: alias -> columns, rows, profile
+#   POST /query {"sql", "format", "timeout"}   streams Arrow IPC or CSV
+#   POST /nl    {"prompt", "timeout"}         {"sql": ..., "tables": [...]}
+import argparse
+import json
+import queue
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+from engine import (
+    DEFAULT_MEMORY_CAP_MB, DEFAULT_PAGE_SIZE, LLM_ERROR_PREFIX, LLM_TIMEOUT_S,
+    QueryResult, arrow_reader, is_read_only_sql, open_cursor, quote_ident,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_POOL_SIZE = 8
+DEFAULT_QUERY_TIMEOUT_S = 300
+POOL_WAIT_S = 10
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+CATALOG_KEYS = ("file", "sheet", "files", "rows", "columns", "context", "profile", "storage_bytes")
+
+
+# Cursors are opened up front on the shared connection; a request holds one
+# for as long as its response is streaming.
+class CursorPool:
+    def __init__(self, engine, size=DEFAULT_POOL_SIZE):
+        self.cursors = queue.Queue()
+        for _ in range(size):
+            self.cursors.put(open_cursor(engine.conn))
+
+    def acquire(self, timeout=POOL_WAIT_S):
+        return self.cursors.get(timeout=timeout)
+
+    def release(self, cursor):
+        self.cursors.put(cursor)
+
+    def close(self):
+        while not self.cursors.empty():
+            self.cursors.get_nowait().close()
+
+
+# Interrupts the cursor if the query is still running when the timer fires.
+# Once the response is streaming it also shuts the socket, so a client that
+# stops reading cannot keep the handler blocked in a write and hold the slot.
+# The lock keeps a late timer from touching the cursor's next request.
+class QueryDeadline:
+    def __init__(self, cursor, timeout, connection):
+        self.cursor = cursor
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.running = True
+        self.expired = False
+        self.streaming = False
+        self.timer = threading.Timer(timeout, self.expire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def expire(self):
+        with self.lock:
+            if self.running:
+                self.expired = True
+                self.cursor.interrupt()
+                if self.streaming:
+                    try:
+                        self.connection.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+    def finish(self):
+        self.timer.cancel()
+        with self.lock:
+            self.running = False
+
+
+class ChunkedWriter:
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.closed = False
+
+    def write(self, data):
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + bytes(data) + b"\r\n")
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def finish(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+        self.closed = True
+
+
+class QueryService(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, engine, address, pool_size=DEFAULT_POOL_SIZE, query_timeout=DEFAULT_QUERY_TIMEOUT_S):
+        super().__init__(address, QueryHandler)
+        self.engine = engine
+        self.pool = CursorPool(engine, pool_size)
+        self.query_timeout = query_timeout
+
+    def catalog(self):
+        return {
+            alias: {key: meta.get(key) for key in CATALOG_KEYS}
+            for alias, meta in self.engine.tables.items()
+        }
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/tables":
+            self.send_json(200, self.server.catalog())
+        elif self.path == "/health":
+            self.send_json(200, {"tables": len(self.server.engine.tables)})
+        else:
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as ex:
+            self.send_json(400, {"error": f"invalid JSON body: {ex}"})
+            return
+        if not isinstance(body, dict):
+            self.send_json(400, {"error": "the body must be a JSON object"})
+            return
+        if self.path == "/query":
+            self.run_query(body)
+        elif self.path == "/nl":
+            self.generate_sql(body)
+        else:
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    # Clients may ask for less time than the server allows, never more.
+    # Raises ValueError or TypeError for anything but a positive number.
+    def request_timeout(self, body, default):
+        value = body.get("timeout")
+        timeout = default if value is None else float(value)
+        if not timeout > 0:
+            raise ValueError(timeout)
+        return min(timeout, self.server.query_timeout)
+
+    def run_query(self, body):
+        sql = body.get("sql") or ""
+        fmt = body.get("format", "arrow")
+        if fmt not in ("arrow", "csv"):
+            self.send_json(400, {"error": "format must be 'arrow' or 'csv'"})
+            return
+        if not is_read_only_sql(sql):
+            # Tables are shared by every client, so only queries are accepted.
+            self.send_json(403, {"error": "only read-only queries are accepted"})
+            return
+        try:
+            timeout = self.request_timeout(body, self.server.query_timeout)
+        except (TypeError, ValueError):
+            self.send_json(400, {"error": "timeout must be a positive number of seconds"})
+            return
+        try:
+            cursor = self.server.pool.acquire()
+        except queue.Empty:
+            self.send_json(503, {"error": "all query slots are busy, retry later"})
+            return
+        deadline = QueryDeadline(cursor, timeout, self.connection)
+        try:
+            try:
+                reader = arrow_reader(cursor, sql, DEFAULT_PAGE_SIZE)
+            except Exception as ex:
+                if deadline.expired:
+                    self.send_json(504, {"error": f"query timed out: {ex}"})
+                else:
+                    self.send_json(400, {"error": str(ex)})
+                return
+            deadline.streaming = True
+            self.send_response(200)
+            self.send_header("Content-Type", ARROW_STREAM_TYPE if fmt == "arrow" else "text/csv")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            sink = ChunkedWriter(self.wfile)
+            try:
+                self.stream_batches(reader, sink, fmt)
+                sink.finish()
+            except Exception as ex:
+                # Headers are gone; dropping the connection without the final
+                # chunk tells the client the body is incomplete.
+                reason = "timed out" if deadline.expired else "aborted"
+                self.log_error("query %s mid-stream: %s", reason, ex)
+                self.close_connection = True
+        finally:
+            deadline.finish()
+            self.server.pool.release(cursor)
+
+    def stream_batches(self, reader, sink, fmt):
+        import pyarrow as pa
+        if fmt == "arrow":
+            with pa.ipc.new_stream(sink, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+            return
+        import pyarrow.csv as pa_csv
+        header = True
+        for batch in reader:
+            pa_csv.write_csv(batch, sink, pa_csv.WriteOptions(include_header=header))
+            header = False
+        if header:
+            pa_csv.write_csv(reader.schema.empty_table(), sink)
+
+    def generate_sql(self, body):
+        prompt = (body.get("prompt") or "").strip()
+        if not prompt:
+            self.send_json(400, {"error": "prompt is required"})
+            return
+        try:
+            timeout = self.request_timeout(body, LLM_TIMEOUT_S)
+        except (TypeError, ValueError):
+            self.send_json(400, {"error": "timeout must be a positive number of seconds"})
+            return
+        included = []
+        sql = self.server.engine.generate_sql(prompt, timeout=timeout, on_tables=included.extend)
+        if sql.startswith(LLM_ERROR_PREFIX):
+            error = sql[len(LLM_ERROR_PREFIX):].lstrip(": ")
+            self.send_json(502, {"error": error, "sql": sql, "tables": included})
+            return
+        self.send_json(200, {"sql": sql, "tables": included})
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# --- Client side (desktop thin-client mode) ---
+def post_json(url, path, payload, timeout):
+    req = urlrequest.Request(
+        url.rstrip("/") + path, data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    try:
+        return urlrequest.urlopen(req, timeout=timeout)
+    except urlerror.HTTPError as ex:
+        try:
+            error = json.loads(ex.read())
+            message = error.get("error") or error.get("sql") or ex.reason
+        except ValueError:
+            message = ex.reason
+        raise RuntimeError(f"{ex.code}: {message}") from None
+
+
+def remote_tables(url, timeout=POOL_WAIT_S):
+    with urlrequest.urlopen(url.rstrip("/") + "/tables", timeout=timeout) as response:
+        tables = json.loads(response.read())
+    for meta in tables.values():
+        meta["columns"] = [tuple(c) for c in meta["columns"]]
+        meta["kind"] = "remote"
+    return tables
+
+
+# Returns (sql, aliases in the prompt); failures come back as LLM error SQL
+# like the local path.
+def remote_generate_sql(url, prompt, timeout=LLM_TIMEOUT_S):
+    try:
+        with post_json(url, "/nl", {"prompt": prompt, "timeout": timeout}, timeout + POOL_WAIT_S) as response:
+            payload = json.loads(response.read())
+    except Exception as ex:
+        return f"{LLM_ERROR_PREFIX}: {ex}", []
+    return payload["sql"], payload["tables"]
+
+
+# A QueryResult whose record batches arrive as an Arrow IPC stream from a
+# query service instead of a local cursor. Pages are read up to the memory
+# cap as soon as the query runs, so the response (and the server's cursor
+# slot) is released instead of waiting for the grid to scroll.
+class RemoteQueryResult(QueryResult):
+    def __init__(self, url, sql, page_size=DEFAULT_PAGE_SIZE, memory_cap_mb=DEFAULT_MEMORY_CAP_MB,
+                 timeout=DEFAULT_QUERY_TIMEOUT_S, timings=None):
+        self.url = url
+        self.timeout = timeout
+        self.response = None
+        super().__init__(None, sql, page_size, memory_cap_mb, timings)
+
+    def open(self):
+        return None
+
+    def request(self, sql):
+        import pyarrow as pa
+        response = post_json(self.url, "/query", {"sql": sql, "format": "arrow", "timeout": self.timeout},
+                             self.timeout + POOL_WAIT_S)
+        return response, pa.ipc.open_stream(response)
+
+    def execute(self):
+        with self.span("execute"):
+            self.response, self.reader = self.request(self.sql)
+        self.columns = list(self.reader.schema.names)
+        self.dtypes = self.reader.schema.empty_table().to_pandas().dtypes
+        while self.has_more():
+            self.fetch_page()
+        return self
+
+    def stream(self, columns=None):
+        if self.is_complete():
+            yield from super().stream(columns)
+            return
+        sql = self.select_sql
+        if columns is not None:
+            sql = f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM (\n{self.select_sql}\n)"
+        response, reader = self.request(sql)
+        with response:
+            for batch in reader:
+                yield batch.to_pandas()
+
+    def interrupt(self):
+        response = self.response
+        if response is not None:
+            response.close()
+
+    def close(self):
+        if self.response is not None:
+            self.response.close()
+            self.response = None
+            self.reader = None
+
+
+def main(argv=None):
+    from cli import add_duckdb_arguments, open_engine, parse_table_spec
+    parser = argparse.ArgumentParser(description="Serve registered tables over HTTP on this machine.")
+    parser.add_argument("-t", "--table", dest="tables", action="append", default=[], type=parse_table_spec,
+                        metavar="ALIAS=PATH[:SHEETS]", help="register a file, glob or workbook sheets (repeatable)")
+    parser.add_argument("-w", "--workspace", help="serve the tables of a DuckDB workspace")
+    parser.add_argument("--ingest", choices=["table", "view"], default="table")
+    add_duckdb_arguments(parser)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pool", type=int, default=DEFAULT_POOL_SIZE, help="concurrent queries")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_QUERY_TIMEOUT_S,
+                        help="maximum seconds per request (clients may ask for less)")
+    args = parser.parse_args(argv)
+
+    engine = open_engine(args)
+    engine.default_kind = args.ingest
+    for alias, path, sheets in args.tables:
+        try:
+            engine.register_path(alias, path, sheets)
+        except Exception as ex:
+            print(f"error: could not register {alias} from {path}: {ex}", file=sys.stderr)
+            return 3
+    server = QueryService(engine, (args.host, args.port), args.pool, args.timeout)
+    print(f"Serving {len(engine.tables)} tables on http://{args.host}:{server.server_port} "
+          f"({args.pool} query slots)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())